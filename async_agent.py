@@ -0,0 +1,260 @@
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+from google.genai import types
+from compaction import compact_messages
+from config import MAX_CONCURRENT_SESSIONS, MAX_ITERATIONS, WORKING_DIRECTORY
+from dispatcher import dispatch_function_calls_async
+from dispatcher import stats as dispatch_stats
+from functions.prefetch import format_prefetch_stats
+from functions.tool_cache import tool_cache
+from main import function_map, function_response, get_generate_config, model_name
+from model_client import create_client, format_request_stats, get_scheduler, request_priority
+from tracing import span, start_tracing, stop_tracing
+from response_cache import CachingClient, ResponseCache, format_stats, model_cache_option
+
+
+def _to_async(function):
+    async def wrapper(**kwargs):
+        # The tools do blocking file and subprocess I/O, keep it off the event loop
+        return await asyncio.to_thread(function, **kwargs)
+
+    return wrapper
+
+
+# Async wrappers around the tools in functions/
+async_function_map = {
+    function_name: _to_async(function)
+    for function_name, function in function_map.items()
+}
+
+
+async def call_function_async(
+    function_call_part,
+    verbose=False,
+    working_directory=WORKING_DIRECTORY,
+    log_calls=True,
+):
+    function_name = function_call_part.name
+
+    if verbose:
+        print(f"Calling function: {function_name}({function_call_part.args})")
+    elif log_calls:
+        print(f" - Calling function: {function_name}")
+
+    if function_name not in async_function_map:
+        return function_response(
+            function_name, {"error": f"Unknown function: {function_name}"}
+        )
+
+    args = dict(function_call_part.args)
+    args["working_directory"] = working_directory
+
+    function_result = await async_function_map[function_name](**args)
+    return function_response(function_name, {"result": function_result})
+
+
+async def run_session(
+    client,
+    user_prompt,
+    verbose=False,
+    max_iterations=MAX_ITERATIONS,
+    working_directory=WORKING_DIRECTORY,
+    log_calls=True,
+):
+    """Drive one agent session to completion on the async client.
+
+    Returns a dict with the final text (or error), the number of model
+    round-trips and the token usage of the last response.
+    """
+    result = {
+        "prompt": user_prompt,
+        "text": None,
+        "error": None,
+        "iterations": 0,
+        "prompt_tokens": None,
+        "response_tokens": None,
+        "prompt_token_counts": [],
+    }
+
+    def count_tokens(contents):
+        return client.models.count_tokens(
+            model=model_name, contents=contents
+        ).total_tokens
+
+    messages = [
+        types.Content(role="user", parts=[types.Part(text=user_prompt)]),
+    ]
+
+    for iteration in range(max_iterations):
+        result["iterations"] = iteration + 1
+        try:
+            # count_tokens is blocking, so compaction runs off the event loop
+            contents, _ = await asyncio.to_thread(
+                compact_messages,
+                messages,
+                count_tokens,
+                working_directory=working_directory,
+            )
+            # Sessions further along are served first when requests queue
+            # for quota, so finishing sessions isn't held up by new ones
+            with span("model", "model", iteration=iteration + 1) as model_span:
+                with request_priority(-(iteration + 1)):
+                    response = await client.aio.models.generate_content(
+                        model=model_name,
+                        contents=contents,
+                        config=get_generate_config(),
+                    )
+                if response.usage_metadata:
+                    model_span["prompt_tokens"] = response.usage_metadata.prompt_token_count
+                    model_span["response_tokens"] = response.usage_metadata.candidates_token_count
+        except Exception as e:
+            result["error"] = f"Error during generation: {e}"
+            return result
+
+        if response.usage_metadata:
+            result["prompt_tokens"] = response.usage_metadata.prompt_token_count
+            result["response_tokens"] = response.usage_metadata.candidates_token_count
+            result["prompt_token_counts"].append(result["prompt_tokens"])
+
+        for candidate in response.candidates:
+            messages.append(candidate.content)
+
+        if response.function_calls:
+            function_responses = await dispatch_function_calls_async(
+                response.function_calls,
+                lambda function_call_part: call_function_async(
+                    function_call_part, verbose, working_directory, log_calls
+                ),
+            )
+            for function_call_result in function_responses:
+                if verbose:
+                    print(f"-> {function_call_result.parts[0].function_response.response}")
+                messages.append(function_call_result)
+
+        elif response.text:
+            result["text"] = response.text
+            return result
+
+        else:
+            result["error"] = "No response text or function calls received"
+            return result
+
+    result["error"] = f"Maximum iterations ({max_iterations}) reached without completion"
+    return result
+
+
+async def run_sessions(
+    client,
+    user_prompts,
+    verbose=False,
+    max_concurrent_sessions=MAX_CONCURRENT_SESSIONS,
+    max_iterations=MAX_ITERATIONS,
+    working_directory=WORKING_DIRECTORY,
+    log_calls=True,
+):
+    """Run many sessions on one client, at most max_concurrent_sessions at a time.
+
+    Results are returned in the same order as user_prompts.
+    """
+    semaphore = asyncio.Semaphore(max_concurrent_sessions)
+
+    async def bounded_session(user_prompt):
+        async with semaphore:
+            return await run_session(
+                client,
+                user_prompt,
+                verbose,
+                max_iterations,
+                working_directory,
+                log_calls,
+            )
+
+    return await asyncio.gather(
+        *(bounded_session(user_prompt) for user_prompt in user_prompts)
+    )
+
+
+def _int_option(argv, name, default):
+    # Accepts both "--name N" and "--name=N"
+    for index, arg in enumerate(argv):
+        if arg == name and index + 1 < len(argv):
+            return int(argv[index + 1])
+        if arg.startswith(name + "="):
+            return int(arg.split("=", 1)[1])
+    return default
+
+
+def main():
+    argv = sys.argv[1:]
+    verbose = "--verbose" in argv
+    max_concurrent_sessions = _int_option(
+        argv, "--max-sessions", MAX_CONCURRENT_SESSIONS
+    )
+    max_iterations = _int_option(argv, "--max-iterations", MAX_ITERATIONS)
+
+    user_prompts = []
+    skip_next = False
+    for arg in argv:
+        if skip_next:
+            skip_next = False
+        elif arg in ("--max-sessions", "--max-iterations", "--model-cache", "--trace"):
+            skip_next = True
+        elif not arg.startswith("--"):
+            user_prompts.append(arg)
+
+    if not user_prompts:
+        print("No input provided")
+        exit(1)
+
+    load_dotenv()
+    client = create_client(os.environ.get("GEMINI_API_KEY"))
+    model_cache_mode = model_cache_option(argv)
+    if model_cache_mode:
+        client = CachingClient(client, ResponseCache(model_cache_mode))
+
+    # --trace <path> writes a trace of every session, as in main.py
+    trace_path = None
+    if "--trace" in argv[:-1]:
+        trace_path = argv[argv.index("--trace") + 1]
+        tracer = start_tracing()
+
+    results = asyncio.run(
+        run_sessions(
+            client,
+            user_prompts,
+            verbose=verbose,
+            max_concurrent_sessions=max_concurrent_sessions,
+            max_iterations=max_iterations,
+        )
+    )
+
+    if trace_path:
+        stop_tracing()
+        tracer.export(trace_path)
+
+    for index, result in enumerate(results):
+        if len(results) > 1:
+            print(f"[{index}] {result['prompt']}")
+        print(result["text"] if result["error"] is None else result["error"])
+        if verbose:
+            print(f"Prompt tokens: {result['prompt_tokens']}")
+            print(f"Response tokens: {result['response_tokens']}")
+            for index, prompt_token_count in enumerate(result["prompt_token_counts"]):
+                print(f"Iteration {index + 1}: prompt tokens={prompt_token_count}")
+
+    if verbose:
+        cache_stats = tool_cache.stats()
+        print(
+            f"Tool cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses"
+        )
+        print(format_prefetch_stats(cache_stats))
+        print(f"Deduplicated tool calls: {dispatch_stats()['deduplicated_calls']}")
+        if model_cache_mode:
+            print(format_stats(client.cache))
+        print(format_request_stats(get_scheduler()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from dotenv import load_dotenv
+from async_agent import run_session
+from config import BATCH_PARALLELISM, MAX_ITERATIONS, WORKING_DIRECTORY
+from model_client import create_client, format_request_stats, get_scheduler
+from response_cache import MODES, CachingClient, ResponseCache, format_stats
+from tracing import start_tracing, stop_tracing
+
+
+def read_prompts(input_file):
+    """Yield prompt records from a JSONL file object.
+
+    Each line is either a JSON object with a "prompt" key (and optionally
+    "id", "working_directory" and "max_iterations") or a bare JSON string.
+    Records without an id get their line number. An id seen before raises
+    ValueError, since each id names one working directory and one result.
+    """
+    seen = {}
+    for line_number, line in enumerate(input_file, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if isinstance(record, str):
+            record = {"prompt": record}
+        record.setdefault("id", str(line_number))
+        record["id"] = str(record["id"])
+        if record["id"] in seen:
+            raise ValueError(
+                f'Duplicate prompt id "{record["id"]}" on line {line_number}, '
+                f"first used on line {seen[record['id']]}"
+            )
+        seen[record["id"]] = line_number
+        yield record
+
+
+def completed_ids(output_path):
+    """Return the ids already in the output file, so a rerun can skip them.
+
+    A partial last line left by a crash is cut off so appends stay valid.
+    """
+    if not os.path.exists(output_path):
+        return set()
+
+    ids = set()
+    with open(output_path, "rb+") as file:
+        data = file.read()
+        if data and not data.endswith(b"\n"):
+            keep = data.rfind(b"\n") + 1
+            file.truncate(keep)
+            data = data[:keep]
+    for line in data.splitlines():
+        try:
+            ids.add(str(json.loads(line)["id"]))
+        except (ValueError, KeyError):
+            continue
+    return ids
+
+
+def prepare_working_directory(record, template, workdir_root):
+    if record.get("working_directory"):
+        return record["working_directory"]
+
+    # Every prompt gets a fresh copy of the template, so sessions that write
+    # files never see each other's changes. The name is readable but ends in
+    # a hash of the whole id, so different ids never share a directory and
+    # no id can name "." or "..".
+    digest = hashlib.sha1(record["id"].encode()).hexdigest()[:16]
+    readable = re.sub(r"[^\w-]", "_", record["id"])[:48]
+    working_directory = os.path.join(workdir_root, f"{readable}-{digest}")
+
+    root = os.path.realpath(workdir_root)
+    if os.path.dirname(os.path.realpath(working_directory)) != root:
+        raise ValueError(f'Working directory for id "{record["id"]}" is outside {workdir_root}')
+    if os.path.lexists(working_directory):
+        shutil.rmtree(working_directory)
+    shutil.copytree(
+        template, working_directory, ignore=shutil.ignore_patterns("__pycache__")
+    )
+    return working_directory
+
+
+async def run_batch(
+    client,
+    records,
+    output_path,
+    parallelism=BATCH_PARALLELISM,
+    template=WORKING_DIRECTORY,
+    workdir_root=None,
+    max_iterations=MAX_ITERATIONS,
+):
+    """Run every record not already in output_path, appending results as they finish.
+
+    Returns the number of prompts run and the number skipped as already done.
+    """
+    workdir_root = workdir_root or f"{output_path}.workdirs"
+    done = completed_ids(output_path)
+    semaphore = asyncio.Semaphore(parallelism)
+    write_lock = asyncio.Lock()
+    tasks = []
+    skipped = 0
+
+    with open(output_path, "a") as output:
+
+        async def run_record(record):
+            try:
+                started = time.perf_counter()
+                try:
+                    working_directory = await asyncio.to_thread(
+                        prepare_working_directory, record, template, workdir_root
+                    )
+                    result = await run_session(
+                        client,
+                        record["prompt"],
+                        max_iterations=int(record.get("max_iterations", max_iterations)),
+                        working_directory=working_directory,
+                        log_calls=False,
+                    )
+                except Exception as e:
+                    working_directory = None
+                    result = {"prompt": record["prompt"], "text": None, "error": str(e)}
+
+                result["id"] = record["id"]
+                result["working_directory"] = working_directory
+                result["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+                result["total_prompt_tokens"] = sum(
+                    count or 0 for count in result.get("prompt_token_counts", [])
+                )
+                async with write_lock:
+                    output.write(json.dumps(result) + "\n")
+                    output.flush()
+            finally:
+                semaphore.release()
+
+        # Records are read lazily, at most `parallelism` sessions are in
+        # flight. Reading may block (stdin waits for input), so it happens
+        # on a worker thread instead of holding up the running sessions.
+        records = iter(records)
+        try:
+            while True:
+                record = await asyncio.to_thread(next, records, None)
+                if record is None:
+                    break
+                if record["id"] in done:
+                    skipped += 1
+                    continue
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(run_record(record)))
+        finally:
+            # On bad input, the sessions already started still finish and
+            # record their results, so a rerun skips them
+            await asyncio.gather(*tasks)
+
+    return len(tasks), skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run many agent prompts from a JSONL file over one shared client."
+    )
+    parser.add_argument("input", help='JSONL file with one prompt per line, or "-" for stdin')
+    parser.add_argument("--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--parallel", type=int, default=BATCH_PARALLELISM)
+    parser.add_argument(
+        "--template",
+        default=WORKING_DIRECTORY,
+        help="Directory copied as the working directory of each prompt",
+    )
+    parser.add_argument("--workdir-root", help="Where per-prompt working directories are created")
+    parser.add_argument("--max-iterations", type=int, default=MAX_ITERATIONS)
+    parser.add_argument("--model-cache", choices=MODES, help="Record or replay model responses")
+    parser.add_argument(
+        "--trace",
+        help="Write a trace of the batch: Chrome trace events for a .json path, JSON lines otherwise",
+    )
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = create_client(os.environ.get("GEMINI_API_KEY"))
+    if args.model_cache:
+        client = CachingClient(client, ResponseCache(args.model_cache))
+    tracer = start_tracing() if args.trace else None
+
+    input_file = sys.stdin if args.input == "-" else open(args.input)
+    try:
+        ran, skipped = asyncio.run(
+            run_batch(
+                client,
+                read_prompts(input_file),
+                args.output,
+                parallelism=args.parallel,
+                template=args.template,
+                workdir_root=args.workdir_root,
+                max_iterations=args.max_iterations,
+            )
+        )
+    except ValueError as e:
+        print(f"Error: invalid input: {e}")
+        exit(1)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if tracer is not None:
+            stop_tracing()
+            tracer.export(args.trace)
+
+    print(f"Ran {ran} prompts, skipped {skipped} already completed")
+    if args.model_cache:
+        print(format_stats(client.cache))
+    print(format_request_stats(get_scheduler()))
+
+
+if __name__ == "__main__":
+    main()
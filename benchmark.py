@@ -0,0 +1,308 @@
+"""Benchmarks for the agent's tools and for whole sessions against a replayed model.
+
+    python benchmark.py [--full] [--output report.json] [--baseline benchmarks/baseline.json]
+
+Tool benchmarks run over synthetic trees in a temporary directory. Session
+benchmarks replay recorded Gemini responses from benchmarks/*.json through
+async_agent.run_sessions, so they measure the agent's own overhead with no
+network traffic. Each session repeat gets a fresh copy of the calculator
+and an empty tool cache. With --baseline, results are compared against a
+stored report and the exit code is 1 if any benchmark got slower than the
+threshold. benchmarks/baseline.json is the report of the quick benchmarks
+at the current state of the tree; timings depend on the machine, so compare
+against a report made with --output on the same one.
+"""
+import argparse
+import asyncio
+import glob
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from google.genai import types
+from functions.get_file_content import get_file_content
+from functions.get_files_info import get_files_info, get_files_info_tracked
+from functions.python_worker_pool import WorkerPool
+from functions.run_python_file import run_python_file
+from functions.tool_cache import tracked_tool
+from functions.write_file import write_file
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+CALCULATOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calculator")
+
+KB = 1024
+MB = 1024 * KB
+GB = 1024 * MB
+
+QUICK_TREE_SIZES = [10, 1_000, 10_000]
+FULL_TREE_SIZES = QUICK_TREE_SIZES + [100_000]
+QUICK_FILE_SIZES = [KB, MB, 64 * MB]
+FULL_FILE_SIZES = QUICK_FILE_SIZES + [GB]
+
+
+def measure(name, function, repeat, setup=None):
+    """Run function repeat times and summarize its wall times in seconds.
+
+    setup, if given, runs untimed before each repeat and its return value is
+    passed to function.
+    """
+    times = []
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return {
+        "name": name,
+        "repeat": repeat,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+    }
+
+
+def make_tree(root, file_count, files_per_directory=100):
+    """Create file_count small files spread over nested directories."""
+    for index in range(file_count):
+        directory = os.path.join(root, f"d{index // files_per_directory:05d}")
+        if index % files_per_directory == 0:
+            os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"f{index:06d}.txt"), "w") as file:
+            file.write(f"file {index}\n")
+
+
+def make_file(path, size):
+    line = "x" * 79 + "\n"
+    chunk = line * (MB // len(line))
+    with open(path, "w") as file:
+        written = 0
+        while written < size:
+            piece = chunk[: size - written]
+            file.write(piece)
+            written += len(piece)
+
+
+def tool_benchmarks(workdir, tree_sizes, file_sizes, repeat):
+    results = []
+    cached_list = tracked_tool(get_files_info_tracked, "directory")
+
+    for file_count in tree_sizes:
+        root = os.path.join(workdir, f"tree_{file_count}")
+        make_tree(root, file_count)
+        results.append(
+            measure(f"get_files_info/list/{file_count}_files", lambda: get_files_info(root), repeat)
+        )
+        results.append(
+            measure(
+                f"get_files_info/recursive_page/{file_count}_files",
+                lambda: get_files_info(root, max_depth=0),
+                repeat,
+            )
+        )
+        # A page of a recursive listing through the tool cache, hits after
+        # the first repeat
+        results.append(
+            measure(
+                f"get_files_info/cached_recursive_page/{file_count}_files",
+                lambda: cached_list(root, max_depth=0, limit=20),
+                repeat,
+            )
+        )
+        shutil.rmtree(root)
+
+    for size in file_sizes:
+        name = f"{size // KB}KB"
+        make_file(os.path.join(workdir, f"{name}.txt"), size)
+        results.append(
+            measure(
+                f"get_file_content/head/{name}",
+                lambda: get_file_content(workdir, f"{name}.txt"),
+                repeat,
+            )
+        )
+        results.append(
+            measure(
+                f"get_file_content/middle_slice/{name}",
+                lambda: get_file_content(workdir, f"{name}.txt", offset=size // 2, length=1000),
+                repeat,
+            )
+        )
+        os.remove(os.path.join(workdir, f"{name}.txt"))
+
+    for size in (KB, MB):
+        content = "y" * size
+        results.append(
+            measure(
+                f"write_file/{size // KB}KB",
+                lambda: write_file(workdir, "written.txt", content),
+                repeat,
+            )
+        )
+
+    calculator = os.path.join(workdir, "calculator")
+    shutil.copytree(CALCULATOR_DIR, calculator, ignore=shutil.ignore_patterns("__pycache__"))
+    results.append(
+        measure(
+            "run_python_file/subprocess/calculator_tests",
+            lambda: run_python_file(calculator, "tests.py"),
+            repeat,
+        )
+    )
+    pool = WorkerPool(size=1)
+    try:
+        pool.run(calculator, "tests.py", [], timeout=30)
+        results.append(
+            measure(
+                "run_python_file/worker_pool/calculator_tests",
+                lambda: pool.run(calculator, "tests.py", [], timeout=30),
+                repeat,
+            )
+        )
+    finally:
+        pool.close()
+
+    return results
+
+
+class _ReplayModels:
+    def __init__(self, responses):
+        self.responses = responses
+
+    def _response(self, contents):
+        # The turn is the number of model replies already in the conversation
+        turn = sum(1 for content in contents if content.role == "model")
+        return self.responses[min(turn, len(self.responses) - 1)]
+
+    async def generate_content(self, model, contents, config=None):
+        return self._response(contents)
+
+    def count_tokens(self, model, contents, config=None):
+        characters = sum(len(str(content)) for content in contents)
+        return types.CountTokensResponse(total_tokens=characters // 4)
+
+
+class _ReplayAio:
+    def __init__(self, models):
+        self.models = models
+
+
+class ReplayClient:
+    """Stand-in for genai.Client that replays a recorded session.
+
+    It is stateless, so any number of concurrent sessions can share it.
+    """
+
+    def __init__(self, responses):
+        responses = [types.GenerateContentResponse.model_validate(r) for r in responses]
+        models = _ReplayModels(responses)
+        self.models = models
+        self.aio = _ReplayAio(models)
+
+
+def session_benchmarks(workdir, sessions, repeat):
+    from async_agent import run_sessions
+    from functions.prefetch import get_prefetcher
+    from functions.tool_cache import tool_cache
+
+    copies = itertools.count()
+
+    def fresh_calculator():
+        # Every repeat starts cold: a new copy of the calculator, so no index
+        # or cache keyed by path carries over, and an empty tool cache
+        get_prefetcher().join()
+        tool_cache.clear()
+        calculator = os.path.join(workdir, f"session_calculator_{next(copies)}")
+        shutil.copytree(CALCULATOR_DIR, calculator, ignore=shutil.ignore_patterns("__pycache__"))
+        return calculator
+
+    results = []
+    for path in sorted(glob.glob(os.path.join(BENCHMARK_DIR, "*_session.json"))):
+        with open(path) as file:
+            recording = json.load(file)
+        client = ReplayClient(recording["responses"])
+        name = os.path.basename(path).removesuffix("_session.json")
+
+        for count in (1, sessions):
+            def run(calculator):
+                asyncio.run(
+                    run_sessions(
+                        client,
+                        [recording["prompt"]] * count,
+                        working_directory=calculator,
+                        log_calls=False,
+                    )
+                )
+
+            results.append(
+                measure(f"session/{name}/{count}_sessions", run, repeat, setup=fresh_calculator)
+            )
+    return results
+
+
+def compare(report, baseline, threshold):
+    """Print how each benchmark moved against the baseline; return the regressions."""
+    baseline_results = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        previous = baseline_results.get(result["name"])
+        if previous is None or previous["median"] == 0:
+            continue
+        ratio = result["median"] / previous["median"]
+        marker = ""
+        if ratio > 1 + threshold:
+            marker = "  REGRESSION"
+            regressions.append(result["name"])
+        print(f"{result['name']}: {previous['median'] * 1000:.3f}ms -> {result['median'] * 1000:.3f}ms ({ratio:.2f}x){marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agent's tools and loop.")
+    parser.add_argument("--full", action="store_true", help="Include 100k-file trees and 1 GB files")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent replayed sessions")
+    parser.add_argument("--output", help="Where the JSON report is written")
+    parser.add_argument("--baseline", help="Report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown, 0.2 is 20%%")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="agent-bench-")
+    try:
+        results = tool_benchmarks(
+            workdir,
+            FULL_TREE_SIZES if args.full else QUICK_TREE_SIZES,
+            FULL_FILE_SIZES if args.full else QUICK_FILE_SIZES,
+            args.repeat,
+        )
+        results += session_benchmarks(workdir, args.sessions, args.repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    for result in results:
+        print(f"{result['name']}: median {result['median'] * 1000:.3f}ms, min {result['min'] * 1000:.3f}ms")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
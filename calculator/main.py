@@ -1,13 +1,58 @@
+import argparse
+import os
 import sys
 from pkg.calculator import Calculator
 from pkg.render import render
 
 
+def bulk_main(args):
+    from pkg.bulk import FORMATS, evaluate_stream, write_records
+
+    parser = argparse.ArgumentParser(
+        prog="python main.py --bulk",
+        description="Evaluate one expression per line from a file or stdin.",
+    )
+    parser.add_argument(
+        "path", nargs="?", default="-", help="input file, or - for stdin"
+    )
+    parser.add_argument("--format", choices=FORMATS, default="plain")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="processes to evaluate chunks of lines in; 0 uses every core",
+    )
+    options = parser.parse_args(args)
+    workers = options.workers or os.cpu_count() or 1
+
+    if options.path == "-":
+        source = sys.stdin
+    else:
+        try:
+            source = open(options.path, encoding="utf-8")
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+
+    with source:
+        records = evaluate_stream(source, workers=workers)
+        evaluated, failed = write_records(records, sys.stdout, options.format)
+
+    if failed:
+        print(f"{failed} of {evaluated} expressions failed", file=sys.stderr)
+        return 1
+    return 0
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--bulk":
+        sys.exit(bulk_main(sys.argv[2:]))
+
     calculator = Calculator()
     if len(sys.argv) <= 1:
         print("Calculator App")
         print('Usage: python main.py "<expression>"')
+        print('       python main.py --bulk [file] [--format plain|csv|jsonl] [--workers N]')
         print('Example: python main.py "3 + 5"')
         return
 
@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+import math
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from pkg.calculator import Calculator
+from pkg.render import format_result
+
+# Lines handed to a worker process at a time
+CHUNK_SIZE = 1000
+
+# Chunks submitted ahead of the one being written, per worker
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+FORMATS = ("plain", "csv", "jsonl")
+
+# Calculator shared by every chunk evaluated in this process, so compiled
+# expressions are reused across chunks
+_calculator = None
+
+
+def _shared_calculator():
+    global _calculator
+    if _calculator is None:
+        _calculator = Calculator()
+    return _calculator
+
+
+def evaluate_line(calculator, line_number, line):
+    """Returns a (line_number, expression, result, error) record; blank lines
+    give None for both result and error."""
+    expression = line.strip()
+    if not expression:
+        return (line_number, expression, None, None)
+    try:
+        return (line_number, expression, calculator.evaluate(expression), None)
+    except Exception as e:
+        return (line_number, expression, None, str(e))
+
+
+def evaluate_chunk(chunk):
+    calculator = _shared_calculator()
+    return [evaluate_line(calculator, number, line) for number, line in chunk]
+
+
+def _chunks(lines, chunk_size):
+    chunk = []
+    for number, line in enumerate(lines, start=1):
+        chunk.append((number, line))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def evaluate_stream(lines, workers=1, chunk_size=CHUNK_SIZE):
+    """Yields one record per input line, in input order.
+
+    With workers > 1 the lines are evaluated in chunks across that many
+    processes; only a few chunks per worker are held at once, so input of
+    any length streams through in bounded memory.
+    """
+    if workers <= 1:
+        calculator = _shared_calculator()
+        for number, line in enumerate(lines, start=1):
+            yield evaluate_line(calculator, number, line)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in _chunks(lines, chunk_size):
+            pending.append(executor.submit(evaluate_chunk, chunk))
+            if len(pending) >= workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _json_result(result):
+    # JSON has no literal for inf or nan, so those are written as strings
+    if result is None or math.isfinite(result):
+        return result
+    return format_result(result)
+
+
+def write_records(records, out, output_format="plain"):
+    """Writes the records to out and returns (evaluated, failed) counts."""
+    if output_format not in FORMATS:
+        raise ValueError(f"unknown output format: {output_format}")
+
+    writer = None
+    if output_format == "csv":
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(["line", "expression", "result", "error"])
+
+    evaluated = 0
+    failed = 0
+    for number, expression, result, error in records:
+        if not expression:
+            continue
+        evaluated += 1
+        if error is not None:
+            failed += 1
+
+        if output_format == "plain":
+            if error is not None:
+                out.write(f"{number}: Error: {error}\n")
+            else:
+                out.write(f"{format_result(result)}\n")
+        elif output_format == "csv":
+            writer.writerow(
+                [number, expression, "" if error else format_result(result), error or ""]
+            )
+        else:
+            record = {
+                "line": number,
+                "expression": expression,
+                "result": _json_result(result),
+                "error": error,
+            }
+            out.write(json.dumps(record) + "\n")
+    return evaluated, failed
+
+
+def evaluate_text(text, output_format="plain", workers=1):
+    out = io.StringIO()
+    write_records(
+        evaluate_stream(text.splitlines(), workers=workers), out, output_format
+    )
+    return out.getvalue()
@@ -1,3 +1,73 @@
+import functools
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Number of compiled expressions each Calculator keeps
+COMPILE_CACHE_SIZE = 1024
+
+# Operators that compile to the matching Python operator; any other entry
+# in Calculator.operators is called through its function
+NATIVE_OPERATORS = {"+", "-", "*", "/"}
+
+
+class CompiledExpression:
+    def __init__(self, expression, rpn, variables, function):
+        self.expression = expression
+        self.rpn = rpn
+        self.variables = variables
+        self.function = function
+
+    def __call__(self, **values):
+        return self.evaluate(values)
+
+    def evaluate(self, values=None):
+        values = values or {}
+        try:
+            args = [float(values[name]) for name in self.variables]
+        except KeyError as e:
+            raise ValueError(f"no value for variable: {e.args[0]}")
+        return self.function(*args)
+
+    def evaluate_many(self, columns):
+        for name in self.variables:
+            if name not in columns:
+                raise ValueError(f"no value for variable: {name}")
+        lengths = {len(columns[name]) for name in self.variables}
+        if len(lengths) > 1:
+            raise ValueError("all variable columns must have the same length")
+
+        if np is not None:
+            args = [np.asarray(columns[name], dtype=float) for name in self.variables]
+            if not self.variables:
+                return np.full(1, self.function())
+            # Overflow gives inf, as with floats. A zero divisor or an
+            # invalid operation reruns the columns row by row, so they end
+            # the same way evaluate does: ZeroDivisionError for a zero
+            # divisor, nan for inf - inf.
+            try:
+                with np.errstate(divide="raise", invalid="raise", over="ignore"):
+                    return np.asarray(self.function(*args), dtype=float)
+            except FloatingPointError:
+                return np.asarray(self._evaluate_rows(columns), dtype=float)
+
+        if not self.variables:
+            return array("d", [self.function()])
+        return self._evaluate_rows(columns)
+
+    def _evaluate_rows(self, columns):
+        return array(
+            "d",
+            (
+                self.function(*row)
+                for row in zip(*(map(float, columns[name]) for name in self.variables))
+            ),
+        )
+
+
 class Calculator:
     def __init__(self):
         self.operators = {
@@ -12,16 +82,45 @@ class Calculator:
             "*": 2,
             "/": 2,
         }
+        self.compile = functools.lru_cache(maxsize=COMPILE_CACHE_SIZE)(self._compile)
 
-    def evaluate(self, expression):
+    def evaluate(self, expression, variables=None):
         if not expression or expression.isspace():
             return None
+        return self.compile(expression).evaluate(variables)
+
+    def evaluate_many(self, expression, columns):
+        return self.compile(expression).evaluate_many(columns)
+
+    def _compile(self, expression):
+        if not expression or expression.isspace():
+            raise ValueError("empty expression")
         tokens = expression.strip().split()
-        return self._evaluate_infix(tokens)
+        rpn = self._to_rpn(tokens)
+
+        variables = []
+        for kind, value in rpn:
+            if kind == "variable" and value not in variables:
+                variables.append(value)
+
+        function = self._build_function(rpn, variables)
+        return CompiledExpression(expression, rpn, tuple(variables), function)
 
-    def _evaluate_infix(self, tokens):
-        values = []
+    def _to_rpn(self, tokens):
+        # Shunting-yard pass that emits the operations instead of running
+        # them, tracking only the stack depth so that malformed expressions
+        # still fail with a ValueError
+        rpn = []
         operators = []
+        depth = 0
+
+        def emit_operator():
+            nonlocal depth
+            operator = operators.pop()
+            if depth < 2:
+                raise ValueError(f"not enough operands for operator {operator}")
+            depth -= 1
+            rpn.append(("operator", operator))
 
         for token in tokens:
             if token in self.operators:
@@ -30,30 +129,83 @@ class Calculator:
                     and operators[-1] in self.operators
                     and self.precedence[operators[-1]] >= self.precedence[token]
                 ):
-                    self._apply_operator(operators, values)
+                    emit_operator()
                 operators.append(token)
             else:
                 try:
-                    values.append(float(token))
+                    rpn.append(("number", float(token)))
                 except ValueError:
-                    raise ValueError(f"invalid token: {token}")
+                    if not token.isidentifier():
+                        raise ValueError(f"invalid token: {token}")
+                    rpn.append(("variable", token))
+                depth += 1
 
         while operators:
-            self._apply_operator(operators, values)
+            emit_operator()
 
-        if len(values) != 1:
+        if depth != 1:
             raise ValueError("invalid expression")
 
-        return values[0]
+        return rpn
+
+    def _fold_constant(self, rpn):
+        stack = []
+        for kind, value in rpn:
+            if kind == "number":
+                stack.append(value)
+            else:
+                b = stack.pop()
+                a = stack.pop()
+                stack.append(self.operators[value](a, b))
+        return stack[0]
+
+    def _build_function(self, rpn, variables):
+        if not variables:
+            # Expressions without variables are folded to their value: most
+            # are evaluated once, and running the RPN is far cheaper than
+            # generating code for it. Arithmetic errors are raised again
+            # each time the compiled expression is called.
+            try:
+                value = self._fold_constant(rpn)
+            except ArithmeticError as e:
+                error_type, error_args = type(e), e.args
+
+                def fail():
+                    raise error_type(*error_args)
 
-    def _apply_operator(self, operators, values):
-        if not operators:
-            return
+                return fail
+            return lambda: value
 
-        operator = operators.pop()
-        if len(values) < 2:
-            raise ValueError(f"not enough operands for operator {operator}")
+        # Turns the RPN into a Python function over positional arguments,
+        # with one assignment per operator so that long expressions don't
+        # nest, so evaluating it is one call and works on NumPy arrays
+        namespace = {"__builtins__": {}}
+        stack = []
+        lines = []
+        for kind, value in rpn:
+            if kind == "number":
+                if value == value and abs(value) != float("inf"):
+                    stack.append(repr(value))
+                else:
+                    # inf and nan have no literal form
+                    name = f"c{len(namespace)}"
+                    namespace[name] = value
+                    stack.append(name)
+            elif kind == "variable":
+                stack.append(f"v{variables.index(value)}")
+            else:
+                b = stack.pop()
+                a = stack.pop()
+                result = f"t{len(lines)}"
+                if value in NATIVE_OPERATORS:
+                    lines.append(f"    {result} = {a} {value} {b}")
+                else:
+                    name = f"op{len(namespace)}"
+                    namespace[name] = self.operators[value]
+                    lines.append(f"    {result} = {name}({a}, {b})")
+                stack.append(result)
 
-        b = values.pop()
-        a = values.pop()
-        values.append(self.operators[operator](a, b))
\ No newline at end of file
+        arguments = ", ".join(f"v{index}" for index in range(len(variables)))
+        lines.append(f"    return {stack[0]}")
+        exec(f"def compiled({arguments}):\n" + "\n".join(lines), namespace)
+        return namespace["compiled"]
@@ -1,4 +1,6 @@
+import json
 import unittest
+from pkg.bulk import evaluate_text
 from pkg.calculator import Calculator
 
 
@@ -42,6 +44,65 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.calculator.evaluate("+ 3")
 
+    def test_variables(self):
+        result = self.calculator.evaluate("x * 2 + y", {"x": 3, "y": 4})
+        self.assertEqual(result, 10)
+
+    def test_missing_variable(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("x + 1")
+
+    def test_compile_is_cached(self):
+        compiled = self.calculator.compile("x * 4 + 5")
+        self.assertIs(self.calculator.compile("x * 4 + 5"), compiled)
+        self.assertEqual(compiled(x=3), 17)
+
+    def test_evaluate_many(self):
+        result = self.calculator.evaluate_many(
+            "a - b / 2", {"a": [1, 2, 3], "b": [2, 4, 6]}
+        )
+        self.assertEqual(list(result), [0, 0, 0])
+
+    def test_long_expression(self):
+        expression = "x + " + " + ".join(["1"] * 3000)
+        self.assertEqual(self.calculator.evaluate(expression, {"x": 1}), 3001)
+
+    def test_long_constant_expression_zero_divisor(self):
+        expression = " + ".join(["1"] * 3000) + " / 0"
+        for _ in range(2):
+            with self.assertRaises(ZeroDivisionError):
+                self.calculator.evaluate(expression)
+
+    def test_evaluate_many_zero_divisor(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.calculator.evaluate_many("a / b", {"a": [1, 2], "b": [1, 0]})
+
+
+class TestBulk(unittest.TestCase):
+    text = "3 + 5\n\n2 * x\n7 / 2\n"
+
+    def test_plain_reports_errors_per_line(self):
+        output = evaluate_text(self.text)
+        self.assertEqual(output, "8\n3: Error: no value for variable: x\n3.5\n")
+
+    def test_csv(self):
+        output = evaluate_text(self.text, "csv").splitlines()
+        self.assertEqual(output[0], "line,expression,result,error")
+        self.assertEqual(output[1], "1,3 + 5,8,")
+        self.assertEqual(len(output), 4)
+
+    def test_jsonl(self):
+        lines = evaluate_text(self.text, "jsonl").splitlines()
+        self.assertEqual(json.loads(lines[2]), {
+            "line": 4, "expression": "7 / 2", "result": 3.5, "error": None
+        })
+
+    def test_parallel_keeps_order(self):
+        text = "\n".join(f"{i} * 2" for i in range(2500))
+        self.assertEqual(
+            evaluate_text(text, workers=3), evaluate_text(text, workers=1)
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,117 @@
+import os
+import secrets
+import time
+from google.genai import types
+from config import SESSION_LOG_DIR
+from gzip_log import append_record, read_records
+
+
+class SessionNotFound(Exception):
+    pass
+
+
+def new_session_name():
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + secrets.token_hex(3)
+
+
+def session_path(session, directory=SESSION_LOG_DIR):
+    return os.path.join(directory, f"{session}.jsonl.gz")
+
+
+def latest_session(directory=SESSION_LOG_DIR):
+    """Return the name of the most recently written session log, if any."""
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith(".jsonl.gz")]
+    except FileNotFoundError:
+        return None
+    if not names:
+        return None
+    newest = max(names, key=lambda name: os.path.getmtime(os.path.join(directory, name)))
+    return newest[: -len(".jsonl.gz")]
+
+
+def _read_records(session, directory):
+    try:
+        records = list(read_records(session_path(session, directory)))
+    except FileNotFoundError:
+        raise SessionNotFound(f"No checkpoints for session {session}")
+    if not records or records[0]["type"] != "start":
+        raise SessionNotFound(f"No checkpoints for session {session}")
+    return records
+
+
+def load_session(session, until_iteration=None, directory=SESSION_LOG_DIR):
+    """Rebuild a session's conversation from its log.
+
+    Returns (messages, iteration, status): the conversation as of the last
+    checkpoint, or as of the end of until_iteration, the number of the last
+    iteration it includes, and the status the session ended with (None if
+    it never ended cleanly). A forked session starts from its parent's
+    conversation, read from the parent's log.
+    """
+    records = _read_records(session, directory)
+    start = records[0]
+    if start.get("parent"):
+        parent, parent_iteration = start["parent"]
+        messages, iteration, _ = load_session(parent, parent_iteration, directory)
+    else:
+        messages, iteration = [], 0
+
+    status = None
+    for record in records:
+        record_iteration = record.get("iteration", 0)
+        if until_iteration is not None and record_iteration > until_iteration:
+            break
+        if record["type"] in ("user", "model"):
+            messages.append(types.Content.model_validate(record["content"]))
+        elif record["type"] == "tools":
+            messages.extend(types.Content.model_validate(content) for content in record["contents"])
+        elif record["type"] == "end":
+            status = record["status"]
+        if record["type"] != "end":
+            status = None
+        iteration = max(iteration, record_iteration)
+    return messages, iteration, status
+
+
+class SessionLog:
+    """Append-only checkpoint log of one agent session.
+
+    Records are appended with gzip_log, so an append never rewrites earlier
+    checkpoints and a crash can at worst lose the record being written. An
+    iteration is logged as the model's turn as soon as it
+    arrives, then the tool results for it, so resuming never pays for a
+    model call twice. Only new messages are logged; a fork refers to its
+    parent's log instead of copying the shared prefix.
+    """
+
+    def __init__(self, session, directory=SESSION_LOG_DIR):
+        self.session = session
+        self.path = session_path(session, directory)
+
+    def _append(self, record):
+        append_record(self.path, record)
+
+    def start(self, parent=None, parent_iteration=None):
+        record = {"type": "start", "created": time.time(), "parent": None}
+        if parent is not None:
+            record["parent"] = [parent, parent_iteration]
+        self._append(record)
+
+    def user(self, iteration, content):
+        self._append({"type": "user", "iteration": iteration, "content": _dump(content)})
+
+    def model(self, iteration, content):
+        self._append({"type": "model", "iteration": iteration, "content": _dump(content)})
+
+    def tools(self, iteration, contents):
+        self._append(
+            {"type": "tools", "iteration": iteration, "contents": [_dump(content) for content in contents]}
+        )
+
+    def end(self, iteration, status):
+        self._append({"type": "end", "iteration": iteration, "status": status})
+
+
+def _dump(content):
+    return content.model_dump(mode="json", exclude_none=True)
@@ -0,0 +1,134 @@
+import os
+from google.genai import types
+from config import (
+    COMPACTION_KEEP_RECENT_TOOL_RESULTS,
+    COMPACTION_STUB_CHARS,
+    CONTEXT_TOKEN_BUDGET,
+    WORKING_DIRECTORY,
+)
+
+# Tools that change the file named by their file_path argument
+WRITING_TOOLS = ("write_file", "edit_file")
+
+# Rough characters-per-token ratio, used to skip count_tokens while the
+# conversation is clearly far below the budget
+CHARS_PER_TOKEN = 4
+
+
+def _tool_results(messages):
+    """Yield (index, function_name, args, result) for every tool message.
+
+    A tool message carries only the function name, so its arguments are taken
+    from the function calls of the model turn it answers, in call order.
+    """
+    pending_calls = []
+    for index, message in enumerate(messages):
+        if message.role == "model":
+            pending_calls = [
+                part.function_call for part in message.parts or [] if part.function_call
+            ]
+        elif message.role == "tool" and message.parts:
+            function_response = message.parts[0].function_response
+            if function_response is None:
+                continue
+            args = {}
+            if pending_calls and pending_calls[0].name == function_response.name:
+                args = dict(pending_calls.pop(0).args or {})
+            result = (function_response.response or {}).get("result")
+            yield index, function_response.name, args, result
+
+
+def _stub(function_name, text):
+    return types.Content(
+        role="tool",
+        parts=[
+            types.Part.from_function_response(
+                name=function_name, response={"result": text}
+            )
+        ],
+    )
+
+
+def supersede_stale_reads(messages, working_directory=WORKING_DIRECTORY):
+    """Replace file reads that a later successful write_file or edit_file
+    made obsolete with stubs."""
+    messages = list(messages)
+    tool_results = list(_tool_results(messages))
+
+    written_after = set()
+    for index, function_name, args, result in reversed(tool_results):
+        file_path = args.get("file_path")
+        if not isinstance(file_path, str) or not file_path:
+            continue
+        # "./a.py" and "a.py" name the same file
+        full_path = os.path.normpath(os.path.join(working_directory, file_path))
+        if function_name in WRITING_TOOLS:
+            if isinstance(result, str) and not result.startswith("Error:"):
+                written_after.add(full_path)
+        elif function_name == "get_file_content" and full_path in written_after:
+            messages[index] = _stub(
+                function_name,
+                f'[Earlier contents of "{file_path}" omitted, the file was rewritten later in this session]',
+            )
+    return messages
+
+
+def estimate_tokens(messages):
+    characters = 0
+    for message in messages:
+        for part in message.parts or []:
+            if part.text:
+                characters += len(part.text)
+            elif part.function_response:
+                characters += len(str(part.function_response.response))
+            elif part.function_call:
+                characters += len(str(part.function_call.args))
+    return characters // CHARS_PER_TOKEN
+
+
+def compact_messages(
+    messages,
+    count_tokens,
+    budget=CONTEXT_TOKEN_BUDGET,
+    keep_recent=COMPACTION_KEEP_RECENT_TOOL_RESULTS,
+    working_directory=WORKING_DIRECTORY,
+):
+    """Return a compacted copy of messages to send to the model.
+
+    Stale file reads are always stubbed, with file paths resolved against
+    working_directory. If count_tokens(contents) reports
+    more than budget tokens, the oldest tool outputs (all but the last
+    keep_recent) are shrunk to stubs until the conversation fits or nothing
+    is left to shrink. Returns the compacted messages and their token count.
+    """
+    messages = supersede_stale_reads(messages, working_directory)
+
+    # count_tokens is a round-trip of its own, skip it while clearly in budget
+    if estimate_tokens(messages) < budget // 2:
+        return messages, None
+
+    token_count = count_tokens(messages)
+    tool_results = list(_tool_results(messages))
+    if keep_recent:
+        tool_results = tool_results[:-keep_recent]
+    candidates = [
+        (index, function_name, result)
+        for index, function_name, args, result in tool_results
+        if isinstance(result, str) and len(result) > COMPACTION_STUB_CHARS
+    ]
+
+    # Shrink enough outputs to cover the estimated overshoot before recounting
+    candidates.reverse()
+    while token_count > budget and candidates:
+        saved_tokens = 0
+        while candidates and saved_tokens < token_count - budget:
+            index, function_name, result = candidates.pop()
+            messages[index] = _stub(
+                function_name,
+                result[:COMPACTION_STUB_CHARS]
+                + f"[... {len(result) - COMPACTION_STUB_CHARS} characters of an earlier tool output omitted to save context]",
+            )
+            saved_tokens += (len(result) - COMPACTION_STUB_CHARS) // CHARS_PER_TOKEN
+        token_count = count_tokens(messages)
+
+    return messages, token_count
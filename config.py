@@ -1,4 +1,137 @@
 # Configuration settings for the AI agent
 
+import os
+
+# Directory the agent's tools are confined to, unless a session sets its own
+WORKING_DIRECTORY = "./calculator"
+
 # Maximum number of characters to read from a file before truncating
 MAX_FILE_READ_CHARS = 10000
+
+# Maximum number of tool calls from a single model turn that run concurrently
+MAX_TOOL_WORKERS = 4
+
+# Maximum number of model round-trips in a single agent session
+MAX_ITERATIONS = 20
+
+# Maximum number of agent sessions the async loop drives at the same time
+MAX_CONCURRENT_SESSIONS = 100
+
+# Backend used by run_python_file: "subprocess" starts a fresh interpreter per
+# run, "worker_pool" forks each run from a pre-warmed worker interpreter
+RUN_PYTHON_BACKEND = "subprocess"
+
+# Seconds a run_python_file run may take before its process group is killed
+RUN_PYTHON_TIMEOUT = 30
+
+# Resource limits for scripts started by run_python_file: CPU seconds, bytes
+# of address space and open file descriptors. None leaves a limit unchanged.
+RUN_PYTHON_CPU_SECONDS = 30
+RUN_PYTHON_MAX_ADDRESS_SPACE = 2 * 1024 * 1024 * 1024
+RUN_PYTHON_MAX_OPEN_FILES = 256
+
+# Bytes of stdout and of stderr kept from each run_python_file run. Longer
+# output keeps its first and last halves and the middle is dropped.
+RUN_PYTHON_MAX_OUTPUT_BYTES = 10000
+
+# Maximum number of worker processes one run_tests call spreads tests over
+RUN_TESTS_MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+# Fewer tests than this per worker are not worth starting another interpreter
+RUN_TESTS_MIN_TESTS_PER_WORKER = 20
+
+# Seconds a run_tests worker may take, and CPU seconds it may use, before it
+# is killed. Its tests that had not finished are reported as errors.
+RUN_TESTS_TIMEOUT = 120
+
+# Maximum number of failing tests listed with their message by run_tests
+RUN_TESTS_MAX_FAILURES_SHOWN = 20
+
+# Number of warm worker interpreters kept by the "worker_pool" backend
+PYTHON_WORKER_POOL_SIZE = 2
+
+# Number of runs a warm worker serves before it is replaced by a fresh one
+PYTHON_WORKER_MAX_RUNS = 50
+
+# Modules imported by each warm worker before it starts serving runs
+PYTHON_WORKER_PRELOAD = ("unittest", "json", "re", "math", "collections")
+
+# Maximum number of tool results kept in the in-memory tool result cache
+TOOL_CACHE_MAX_ENTRIES = 256
+
+# After get_files_info lists a directory, up to PREFETCH_MAX_FILES of the
+# files it listed that are no larger than PREFETCH_MAX_FILE_BYTES are read
+# into the tool cache in the background, ahead of the model asking for them
+PREFETCH_LISTED_FILES = True
+PREFETCH_MAX_FILES = 8
+PREFETCH_MAX_FILE_BYTES = 32_000
+
+# Whether run_python_file results are cached while no .py file under the
+# working directory changes. Off by default, scripts may not be deterministic.
+CACHE_RUN_PYTHON_FILE = False
+
+# Prompt token budget for the conversation sent to the model each iteration.
+# Older tool outputs are shrunk to short stubs to stay under it.
+CONTEXT_TOKEN_BUDGET = 200000
+
+# Number of most recent tool results that compaction never shrinks
+COMPACTION_KEEP_RECENT_TOOL_RESULTS = 4
+
+# Characters of an old tool output kept in its stub
+COMPACTION_STUB_CHARS = 200
+
+# Maximum number of entries returned by one get_files_info call
+MAX_LIST_ENTRIES = 1000
+
+# Directory for on-disk agent caches such as the search index
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ai-agent")
+
+# Maximum number of matching lines returned by one search_files call
+MAX_SEARCH_RESULTS = 200
+
+# Files larger than this are not indexed or searched
+SEARCH_MAX_FILE_BYTES = 2_000_000
+
+# Minimum number of seconds between checks of the working directory for files
+# changed outside the agent. A check stats the indexed files and lists only the
+# directories whose mtime changed. Writes made through the agent's tools are
+# seen at once.
+SEARCH_INDEX_RESCAN_SECONDS = 2.0
+
+# Minimum number of seconds between saves of a changed search index to
+# CACHE_DIR. Any unsaved changes are written when the process exits.
+SEARCH_INDEX_SAVE_SECONDS = 30.0
+
+# Whether files written by the agent are fsync'ed. Writes from one model turn
+# are made durable together once the turn's tool calls have finished.
+DURABLE_WRITES = True
+
+# Number of prompts a batch run drives at the same time
+BATCH_PARALLELISM = 8
+
+# On-disk store for recorded model responses, see response_cache.py
+MODEL_CACHE_PATH = os.path.join(CACHE_DIR, "model_responses.jsonl.gz")
+
+# Unix socket the resident agent daemon listens on, see daemon.py
+DAEMON_SOCKET_PATH = os.path.join(CACHE_DIR, "agent.sock")
+
+# Directory of the append-only checkpoint logs that let a session be resumed
+# or forked, see checkpoint.py
+SESSION_LOG_DIR = os.path.join(CACHE_DIR, "sessions")
+
+# Client-side limits on model calls, shared by every session in the process.
+# The defaults are the paid tier 1 quota of gemini-2.0-flash; the free tier
+# allows 15 requests and 1,000,000 tokens a minute. None disables a limit.
+MODEL_REQUESTS_PER_MINUTE = 2000
+MODEL_TOKENS_PER_MINUTE = 4_000_000
+
+# Retries of a model call failing with a rate limit, server or network error,
+# with full-jitter exponential backoff between the base and maximum delay.
+# A retry-after from the API is always honored.
+MODEL_MAX_RETRIES = 6
+MODEL_RETRY_BASE_SECONDS = 1.0
+MODEL_RETRY_MAX_SECONDS = 60.0
+
+# Base URL of the Gemini API, e.g. a local fake_endpoint.py to test against
+# injected faults. None uses Google's endpoint.
+MODEL_BASE_URL = os.environ.get("GEMINI_BASE_URL")
@@ -0,0 +1,145 @@
+"""Resident agent daemon and its thin client.
+
+    python daemon.py --serve            start the daemon
+    python daemon.py "<prompt>" [...]   run a prompt on the daemon
+
+The daemon imports google.genai and builds the client once, and keeps the
+client's HTTP connections, the request scheduler's rate limits and the
+tool caches (tool results, search and outline indexes, warm Python workers)
+alive between prompts. The client
+side only imports the standard library, so each prompt starts in a few
+milliseconds. The arguments are the same as for main.py; without a running
+daemon the prompt is run in-process.
+"""
+import json
+import os
+import socket
+import sys
+from config import DAEMON_SOCKET_PATH
+
+
+class _SocketWriter:
+    """File-like object that forwards writes to the client as JSON lines."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def write(self, text):
+        if text:
+            self.connection.sendall((json.dumps({"output": text}) + "\n").encode())
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def serve(socket_path=DAEMON_SOCKET_PATH):
+    import contextlib
+    import socketserver
+    import threading
+    from dotenv import load_dotenv
+    import main
+    from model_client import create_client
+    from tracing import stop_tracing
+
+    load_dotenv()
+    client = create_client(os.environ.get("GEMINI_API_KEY"))
+    main.get_generate_config()
+    # Imported only to preload the modules main imports lazily, so no
+    # request pays for them
+    import checkpoint  # noqa: F401
+    import compaction  # noqa: F401
+    import response_cache  # noqa: F401
+    import streaming  # noqa: F401
+
+    # Sessions print through sys.stdout, which is process-wide, so requests
+    # are served one at a time
+    session_lock = threading.Lock()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline())
+            writer = _SocketWriter(self.connection)
+            exit_code = 0
+            daemon_cwd = os.getcwd()
+            with session_lock, contextlib.redirect_stdout(writer):
+                try:
+                    # Relative paths, such as the default working directory
+                    # and a --trace path, are the client's
+                    os.chdir(request.get("cwd", daemon_cwd))
+                    main.main(["main.py"] + request["args"], client=client)
+                except SystemExit as e:
+                    exit_code = e.code if isinstance(e.code, int) else 1
+                except Exception as e:
+                    print(f"Error: {e}")
+                    exit_code = 1
+                finally:
+                    # A request that ended early must not leave its tracer
+                    # collecting spans for the rest of the daemon's life
+                    stop_tracing()
+                    os.chdir(daemon_cwd)
+            self.connection.sendall((json.dumps({"exit": exit_code}) + "\n").encode())
+
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    # The socket is created owner-only, there is no window before a chmod
+    # in which other users could connect
+    umask = os.umask(0o177)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    finally:
+        os.umask(umask)
+
+    with server:
+        print(f"Agent daemon listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
+
+
+def run_remote(args, socket_path=DAEMON_SOCKET_PATH):
+    """Run a prompt on the daemon, printing its output as it arrives.
+
+    Returns the exit code, or None if no daemon is listening.
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        connection.close()
+        return None
+
+    with connection, connection.makefile("rb") as replies:
+        request = {"args": args, "cwd": os.getcwd()}
+        connection.sendall((json.dumps(request) + "\n").encode())
+        for line in replies:
+            reply = json.loads(line)
+            if "exit" in reply:
+                return reply["exit"]
+            sys.stdout.write(reply["output"])
+            sys.stdout.flush()
+    return 1
+
+
+def main():
+    args = sys.argv[1:]
+    if args[:1] == ["--serve"]:
+        serve()
+        return
+
+    exit_code = run_remote(args)
+    if exit_code is None:
+        import main as agent
+
+        agent.main(["main.py"] + args)
+        return
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from config import MAX_TOOL_WORKERS
+from functions.atomic_write import sync_pending_writes
+
+# How each tool touches the working directory: the argument holding the path
+# it works on (None means the whole working directory) and whether it writes.
+# Tools that are not listed here touch nothing and never wait on other calls.
+TOOL_ACCESS = {
+    "get_files_info": ("directory", False),
+    "get_file_content": ("file_path", False),
+    "write_file": ("file_path", True),
+    "edit_file": ("file_path", True),
+    "search_files": ("directory", False),
+    "get_code_outline": ("path", False),
+    "get_symbol_source": ("file_path", False),
+    # A script may import any module in the working directory
+    "run_python_file": (None, False),
+    "run_tests": (None, False),
+}
+
+# Read-only tools whose result only depends on their arguments and the files
+# they read, so identical calls in one turn can share a single run
+DEDUPLICATED_TOOLS = {
+    "get_files_info",
+    "get_file_content",
+    "search_files",
+    "get_code_outline",
+    "get_symbol_source",
+}
+
+_stats_lock = threading.Lock()
+_deduplicated_calls = 0
+
+
+def stats():
+    with _stats_lock:
+        return {"deduplicated_calls": _deduplicated_calls}
+
+
+def _call_access(function_call_part):
+    if function_call_part.name not in TOOL_ACCESS:
+        return None
+
+    path_arg, writes = TOOL_ACCESS[function_call_part.name]
+    args = function_call_part.args or {}
+    path = args.get(path_arg, ".") if path_arg else "."
+    return os.path.normpath(str(path)), writes
+
+
+def _paths_overlap(a, b):
+    if a == "." or b == ".":
+        return True
+    return a == b or a.startswith(b + os.sep) or b.startswith(a + os.sep)
+
+
+def _conflicts(earlier, later):
+    if earlier is None or later is None:
+        return False
+
+    earlier_path, earlier_writes = earlier
+    later_path, later_writes = later
+
+    # Reads never need to wait on other reads
+    if not earlier_writes and not later_writes:
+        return False
+    return _paths_overlap(earlier_path, later_path)
+
+
+class _Deduplicator:
+    """Finds calls in a turn that repeat an earlier identical read.
+
+    A read is only shared until a later call in the turn writes to an
+    overlapping path, after which it has to run again.
+    """
+
+    def __init__(self):
+        self.seen = {}
+
+    def earlier(self, function_call_part, access, position):
+        """Return the position of an identical earlier call, or None after
+        remembering this call as the one at position."""
+        global _deduplicated_calls
+
+        if access is not None and access[1]:
+            self.seen = {
+                key: (position, earlier_access)
+                for key, (position, earlier_access) in self.seen.items()
+                if not _conflicts(earlier_access, access)
+            }
+        if function_call_part.name not in DEDUPLICATED_TOOLS:
+            return None
+
+        key = (
+            function_call_part.name,
+            json.dumps(function_call_part.args or {}, sort_keys=True, default=str),
+        )
+        if key in self.seen:
+            with _stats_lock:
+                _deduplicated_calls += 1
+            return self.seen[key][0]
+        self.seen[key] = (position, access)
+        return None
+
+
+def _run_after(dependencies, call, function_call_part):
+    wait(dependencies)
+    return call(function_call_part)
+
+
+class CallScheduler:
+    """Submits function calls to an executor one at a time, as they arrive.
+
+    Each call waits for the earlier calls it conflicts with, so calls can be
+    handed over before the model has finished producing the whole turn. A
+    call repeating an earlier identical read shares its future.
+    """
+
+    def __init__(self, executor, call):
+        self.executor = executor
+        self.call = call
+        self.futures = []
+        self.accesses = []
+        self.deduplicator = _Deduplicator()
+
+    def submit(self, function_call_part):
+        access = _call_access(function_call_part)
+        earlier = self.deduplicator.earlier(function_call_part, access, len(self.futures))
+        if earlier is not None:
+            future = self.futures[earlier]
+            self.futures.append(future)
+            self.accesses.append(None)
+            return future
+
+        dependencies = [
+            future
+            for future, earlier in zip(self.futures, self.accesses)
+            if _conflicts(earlier, access)
+        ]
+        future = self.executor.submit(
+            _run_after, dependencies, self.call, function_call_part
+        )
+        self.futures.append(future)
+        self.accesses.append(access)
+        return future
+
+    def results(self):
+        results = [future.result() for future in self.futures]
+        # Writes from the whole turn are made durable together
+        sync_pending_writes()
+        return results
+
+
+def dispatch_function_calls(function_calls, call, max_workers=MAX_TOOL_WORKERS):
+    """Run the function calls from one model turn through `call` concurrently.
+
+    Calls that touch overlapping paths, where at least one of them writes, run
+    in the order the model issued them. Identical reads are run once. Results
+    are returned in call order.
+    """
+    function_calls = list(function_calls)
+    if len(function_calls) <= 1 or max_workers <= 1:
+        deduplicator = _Deduplicator()
+        results = []
+        for function_call_part in function_calls:
+            access = _call_access(function_call_part)
+            earlier = deduplicator.earlier(function_call_part, access, len(results))
+            results.append(call(function_call_part) if earlier is None else results[earlier])
+        sync_pending_writes()
+        return results
+
+    # The pool starts work in submission order, so a call only ever waits on
+    # calls that have already been picked up by a worker
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(function_calls))) as executor:
+        scheduler = CallScheduler(executor, call)
+        for function_call_part in function_calls:
+            scheduler.submit(function_call_part)
+        return scheduler.results()
+
+
+async def _run_after_async(dependencies, semaphore, call, function_call_part):
+    if dependencies:
+        await asyncio.wait(dependencies)
+    async with semaphore:
+        return await call(function_call_part)
+
+
+async def dispatch_function_calls_async(
+    function_calls, call, max_workers=MAX_TOOL_WORKERS
+):
+    """Async counterpart of dispatch_function_calls for a coroutine `call`."""
+    semaphore = asyncio.Semaphore(max_workers)
+    deduplicator = _Deduplicator()
+    tasks = []
+    accesses = []
+    for function_call_part in function_calls:
+        access = _call_access(function_call_part)
+        earlier = deduplicator.earlier(function_call_part, access, len(tasks))
+        if earlier is not None:
+            tasks.append(tasks[earlier])
+            accesses.append(None)
+            continue
+
+        dependencies = [
+            task
+            for task, earlier in zip(tasks, accesses)
+            if _conflicts(earlier, access)
+        ]
+        tasks.append(
+            asyncio.ensure_future(
+                _run_after_async(dependencies, semaphore, call, function_call_part)
+            )
+        )
+        accesses.append(access)
+
+    results = await asyncio.gather(*tasks)
+    await asyncio.to_thread(sync_pending_writes)
+    return results
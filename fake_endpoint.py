@@ -0,0 +1,211 @@
+"""A local stand-in for the Gemini API that replays a recorded session and injects faults.
+
+    python fake_endpoint.py [--port 8765] [--fault-rate 0.2] [--retry-after 1] [--replay recording.json]
+    GEMINI_BASE_URL=http://127.0.0.1:8765 python main.py "..." --verbose
+
+It answers generateContent, streamGenerateContent and countTokens. The
+reply to a conversation is the recorded response for its turn, the number
+of model replies already in it, like benchmark.ReplayClient. A share of
+requests fails with a 429 or 503 carrying a Retry-After header and a
+google.rpc.RetryInfo detail, to see how the agent's request scheduler
+copes with rate limits and outages without spending real quota.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from google.genai import types
+
+DEFAULT_RECORDING = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "benchmarks", "calculator_session.json"
+)
+
+STATUS_NAMES = {
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+    504: "DEADLINE_EXCEEDED",
+}
+
+
+def load_recording(path):
+    """Read a benchmark recording into API-shaped JSON responses."""
+    with open(path) as file:
+        recording = json.load(file)
+    return [
+        types.GenerateContentResponse.model_validate(response).model_dump(
+            mode="json", by_alias=True, exclude_none=True
+        )
+        for response in recording["responses"]
+    ]
+
+
+class FakeEndpoint:
+    """Serves the Gemini REST API on a local port from a list of responses.
+
+    fault_rate is the share of requests that fail with one of
+    fault_statuses; fail_first fails that many requests before any other,
+    for deterministic tests. latency delays every reply by that many seconds.
+    """
+
+    def __init__(
+        self,
+        responses=None,
+        port=0,
+        fault_rate=0.0,
+        fault_statuses=(429, 503),
+        retry_after=1,
+        fail_first=0,
+        seed=None,
+        latency=0.0,
+    ):
+        self.responses = responses or load_recording(DEFAULT_RECORDING)
+        self.fault_rate = fault_rate
+        self.fault_statuses = fault_statuses
+        self.retry_after = retry_after
+        self.fail_first = fail_first
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.faults = {}
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self.lock:
+            return {"requests": self.requests, "faults": dict(self.faults)}
+
+    def _fault(self):
+        """The status to fail the next request with, or None."""
+        with self.lock:
+            self.requests += 1
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                status = self.fault_statuses[0]
+            elif self.fault_statuses and self.random.random() < self.fault_rate:
+                status = self.random.choice(self.fault_statuses)
+            else:
+                return None
+            self.faults[status] = self.faults.get(status, 0) + 1
+            return status
+
+    def _response(self, request):
+        turn = sum(1 for content in request.get("contents", []) if content.get("role") == "model")
+        return self.responses[min(turn, len(self.responses) - 1)]
+
+    def _handler(self):
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body, headers=()):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_error(self, status):
+                error = {
+                    "code": status,
+                    "message": f"Injected fault {status}",
+                    "status": STATUS_NAMES.get(status, "UNKNOWN"),
+                }
+                headers = []
+                if endpoint.retry_after is not None:
+                    error["details"] = [
+                        {
+                            "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                            "retryDelay": f"{endpoint.retry_after}s",
+                        }
+                    ]
+                    headers.append(("Retry-After", str(endpoint.retry_after)))
+                self._send_json(status, {"error": error}, headers)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                method = self.path.split("?")[0].rsplit(":", 1)[-1]
+                if endpoint.latency:
+                    time.sleep(endpoint.latency)
+
+                if method == "countTokens":
+                    characters = len(json.dumps(request.get("contents", [])))
+                    self._send_json(200, {"totalTokens": characters // 4})
+                    return
+                if method not in ("generateContent", "streamGenerateContent"):
+                    self._send_json(404, {"error": {"code": 404, "message": f"Unknown method {method}"}})
+                    return
+
+                status = endpoint._fault()
+                if status is not None:
+                    self._send_error(status)
+                    return
+
+                response = endpoint._response(request)
+                if method == "generateContent":
+                    self._send_json(200, response)
+                    return
+                data = f"data: {json.dumps(response)}\n\n".encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument("--retry-after", type=float, default=1, help="Seconds injected faults ask clients to wait")
+    parser.add_argument("--replay", default=DEFAULT_RECORDING, help="Benchmark recording to serve")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    endpoint = FakeEndpoint(
+        load_recording(args.replay),
+        port=args.port,
+        fault_rate=args.fault_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    print(f"Serving {args.replay} on {endpoint.url}, fault rate {args.fault_rate}")
+    try:
+        endpoint.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        endpoint.server.server_close()
+        stats = endpoint.stats()
+        print(f"{stats['requests']} requests, faults: {stats['faults']}")
+
+
+if __name__ == "__main__":
+    main()
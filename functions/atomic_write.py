@@ -0,0 +1,75 @@
+import os
+import stat
+import tempfile
+import threading
+from config import DURABLE_WRITES
+
+# The process umask, read once at import because reading it means setting
+# it, which would race with other threads creating files
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Directories holding files renamed since the last sync_pending_writes()
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def atomic_write(full_path, content, newline=None):
+    """Replace full_path with content so readers never see a partial file.
+
+    The content goes to a temporary file in the same directory, which is
+    fsync'ed and then renamed over full_path, so a crash leaves either the
+    old or the new content. The rename itself is only made durable by the
+    next sync_pending_writes() call, so that writes to the same directory
+    share one directory sync.
+    """
+    directory = os.path.dirname(full_path)
+    fd, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(full_path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", newline=newline) as file:
+            file.write(content)
+            if DURABLE_WRITES:
+                file.flush()
+                os.fsync(file.fileno())
+        # Keep the permissions of the file being replaced
+        try:
+            os.chmod(temp_path, stat.S_IMODE(os.stat(full_path).st_mode))
+        except FileNotFoundError:
+            # mkstemp creates the file 0600, give it a new file's usual mode
+            os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, full_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+    if DURABLE_WRITES:
+        with _pending_lock:
+            _pending.add(directory)
+
+
+def _fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_pending_writes():
+    """Make the renames of every write since the last call durable, with one
+    fsync per directory written to."""
+    with _pending_lock:
+        directories = list(_pending)
+        _pending.clear()
+
+    for directory in directories:
+        try:
+            # The rename lives in the directory entry
+            _fsync_path(directory)
+        except OSError:
+            pass
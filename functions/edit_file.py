@@ -0,0 +1,125 @@
+import os
+import re
+from functions.atomic_write import atomic_write
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class EditError(Exception):
+    pass
+
+
+def _apply_search_replace(content, edits):
+    for number, edit in enumerate(edits, start=1):
+        search = edit.get("search", "")
+        replace = edit.get("replace", "")
+        if not search:
+            raise EditError(f"edit {number} has an empty search block")
+        count = content.count(search)
+        if count == 0:
+            raise EditError(f"edit {number}: search block not found")
+        if count > 1:
+            raise EditError(
+                f"edit {number}: search block matches {count} times, add context to make it unique"
+            )
+        content = content.replace(search, replace, 1)
+    return content
+
+
+def _parse_hunks(patch):
+    hunks = []
+    hunk = None
+    for line in patch.splitlines():
+        match = HUNK_HEADER.match(line)
+        if match:
+            hunk = {"start": int(match.group(1)), "old": [], "new": []}
+            hunks.append(hunk)
+        elif hunk is None or line.startswith("\\"):
+            # File headers before the first hunk and "\ No newline" markers
+            continue
+        elif line.startswith("-"):
+            hunk["old"].append(line[1:])
+        elif line.startswith("+"):
+            hunk["new"].append(line[1:])
+        elif line.startswith(" ") or line == "":
+            hunk["old"].append(line[1:])
+            hunk["new"].append(line[1:])
+    if not hunks:
+        raise EditError("patch contains no hunks")
+    return hunks
+
+
+def _find_hunk(lines, old, expected):
+    # Try the position from the hunk header first, then search outwards
+    if not old:
+        return min(max(expected, 0), len(lines))
+    for distance in range(len(lines) + 1):
+        for position in (expected - distance, expected + distance):
+            if 0 <= position <= len(lines) - len(old) and lines[position : position + len(old)] == old:
+                return position
+    return None
+
+
+def _apply_patch(content, patch):
+    lines = content.splitlines()
+    trailing_newline = content.endswith(("\n", "\r"))
+    newline = "\r\n" if "\r\n" in content else "\n"
+
+    # Hunks are applied bottom-up so earlier line numbers stay valid
+    for number, hunk in sorted(enumerate(_parse_hunks(patch), start=1), key=lambda item: -item[1]["start"]):
+        position = _find_hunk(lines, hunk["old"], hunk["start"] - 1)
+        if position is None:
+            raise EditError(f"hunk {number} does not match the file")
+        lines[position : position + len(hunk["old"])] = hunk["new"]
+
+    result = newline.join(lines)
+    if trailing_newline and lines:
+        result += newline
+    return result
+
+
+def edit_file(working_directory, file_path, edits=None, patch=None):
+    try:
+        # Convert working_directory to absolute path and normalize it
+        working_directory = os.path.abspath(working_directory)
+        working_directory = os.path.normpath(working_directory)
+
+        # Create the full path by joining working_directory with the relative file_path
+        full_path = os.path.join(working_directory, file_path)
+
+        # Normalize the full path to resolve any ".." or "." components
+        full_path = os.path.normpath(full_path)
+
+        # Check if the full path is within the working directory boundaries
+        if not full_path.startswith(working_directory):
+            return f'Error: Cannot edit "{file_path}" as it is outside the permitted working directory'
+
+        if not os.path.isfile(full_path):
+            return f'Error: File not found or is not a regular file: "{file_path}"'
+
+        if not edits and not patch:
+            return f'Error: No edits or patch given for "{file_path}"'
+
+        with open(full_path, "r", newline="") as file:
+            content = file.read()
+
+        # All edits are applied in memory, then written in one atomic replace
+        try:
+            if edits:
+                content = _apply_search_replace(content, [dict(edit) for edit in edits])
+            if patch:
+                content = _apply_patch(content, patch)
+        except EditError as e:
+            return f'Error: Cannot edit "{file_path}": {e}. The file was not changed.'
+
+        atomic_write(full_path, content, newline="")
+
+        changes = f"{len(edits)} edits" if edits else "patch"
+        return f'Successfully edited "{file_path}" ({changes} applied, {len(content)} characters written)'
+
+    except UnicodeDecodeError:
+        return f'Error: Cannot edit "{file_path}" - file appears to be binary or uses an unsupported encoding'
+    except PermissionError:
+        return f'Error: Permission denied writing to "{file_path}"'
+    except Exception as e:
+        return f"Error: {str(e)}"
@@ -0,0 +1,58 @@
+import os
+from config import MAX_FILE_READ_CHARS
+from functions.outline_index import get_outline, python_files
+
+
+def get_code_outline(working_directory, path="."):
+    try:
+        # Convert working_directory to absolute path and normalize it
+        working_directory = os.path.abspath(working_directory)
+        working_directory = os.path.normpath(working_directory)
+
+        # Create the full path by joining working_directory with the relative path
+        full_path = os.path.join(working_directory, path)
+
+        # Normalize the full path to resolve any ".." or "." components
+        full_path = os.path.normpath(full_path)
+
+        # Check if the full path is within the working directory boundaries
+        if not full_path.startswith(working_directory):
+            return f'Error: Cannot outline "{path}" as it is outside the permitted working directory'
+
+        if not os.path.exists(full_path):
+            return f'Error: "{path}" does not exist'
+
+        if os.path.isfile(full_path) and not full_path.endswith(".py"):
+            return f'Error: "{path}" is not a Python file.'
+
+        result_lines = []
+        length = 0
+        for file_path in python_files(full_path):
+            relative_path = os.path.relpath(file_path, working_directory)
+            outline = get_outline(file_path)
+
+            if isinstance(outline, Exception):
+                lines = [f"{relative_path}: cannot parse: {outline}"]
+            else:
+                lines = [f"{relative_path}:"]
+                for symbol in outline:
+                    indent = "  " * (symbol["depth"] + 1)
+                    lines.append(
+                        f"{indent}{symbol['signature']}  "
+                        f"[{symbol['name']}, lines {symbol['start_line']}-{symbol['end_line']}]"
+                    )
+
+            length += sum(len(line) + 1 for line in lines)
+            if length > MAX_FILE_READ_CHARS:
+                result_lines.append(
+                    f"[...Outline truncated at {MAX_FILE_READ_CHARS} characters, outline a subdirectory for more]"
+                )
+                break
+            result_lines.extend(lines)
+
+        if not result_lines:
+            return f'No Python files found in "{path}"'
+        return "\n".join(result_lines)
+
+    except Exception as e:
+        return f"Error: {str(e)}"
@@ -1,10 +1,95 @@
+import io
 import os
-import sys
 from config import MAX_FILE_READ_CHARS
-from google.genai import types
 
+# Size of the first block of a file that is checked for binary content
+BINARY_SNIFF_BYTES = 8192
 
-def get_file_content(working_directory, file_path):
+# Size of the blocks scanned for newlines when skipping to a start_line
+SKIP_CHUNK_BYTES = 65536
+
+
+def _is_binary(file):
+    block = file.read(BINARY_SNIFF_BYTES)
+    file.seek(0)
+    if b"\0" in block:
+        return True
+    try:
+        # A multi-byte character may be cut off at the end of the block
+        block.decode("utf-8")
+    except UnicodeDecodeError as e:
+        return e.start < len(block) - 3
+    return False
+
+
+def _seek_char_boundary(file, offset):
+    # Skip UTF-8 continuation bytes so decoding starts on a whole character
+    file.seek(offset)
+    for _ in range(3):
+        byte = file.read(1)
+        if not byte or byte[0] & 0xC0 != 0x80:
+            break
+        offset += 1
+    file.seek(offset)
+    return offset
+
+
+def _skip_lines(raw_file, count):
+    # Earlier lines still have to be scanned to find where a line starts,
+    # but only as bytes in fixed-size blocks, so a long line is never held
+    # in memory whole. Returns the offset reached.
+    offset = raw_file.tell()
+    while count > 0:
+        block = raw_file.read(SKIP_CHUNK_BYTES)
+        if not block:
+            break
+        newlines = block.count(b"\n")
+        if newlines < count:
+            count -= newlines
+            offset += len(block)
+            continue
+        position = -1
+        for _ in range(count):
+            position = block.index(b"\n", position + 1)
+        offset += position + 1
+        count = 0
+    raw_file.seek(offset)
+    return offset
+
+
+def _read_lines(text, offset, start_line, end_line, limit):
+    """Read whole lines from start_line, which begins at byte offset, up to
+    limit characters. Returns (content, next_line, next_offset): where to
+    continue, if the slice was cut short. A first line longer than limit is
+    cut at limit characters and continues by byte offset instead."""
+    lines = []
+    length = 0
+    line_number = start_line
+    while end_line is None or line_number <= end_line:
+        # One character past what still fits is enough to tell the line is
+        # too long, without reading the rest of it
+        line = text.readline(limit - length + 1)
+        if not line:
+            break
+        if length + len(line) > limit:
+            if lines:
+                return "".join(lines), line_number, None
+            head = line[:limit]
+            return head, None, offset + len(head.encode("utf-8"))
+        lines.append(line)
+        length += len(line)
+        line_number += 1
+    return "".join(lines), None, None
+
+
+def get_file_content(
+    working_directory,
+    file_path,
+    offset=None,
+    length=None,
+    start_line=None,
+    end_line=None,
+):
     try:
         # Convert working_directory to absolute path and normalize it
         working_directory = os.path.abspath(working_directory)
@@ -27,14 +112,46 @@ def get_file_content(working_directory, file_path):
         if not os.path.isfile(full_path):
             return f'Error: File not found or is not a regular file: "{file_path}"'
 
-        with open(full_path, "r") as file:
-            content = file.read()
+        limit = MAX_FILE_READ_CHARS
+        if length is not None:
+            limit = max(0, min(int(length), MAX_FILE_READ_CHARS))
+
+        # Only the requested slice is read, never the whole file
+        with open(full_path, "rb") as raw_file:
+            if _is_binary(raw_file):
+                return f'Error: Cannot read "{file_path}" - file appears to be binary or uses an unsupported encoding'
 
-        if len(content) > MAX_FILE_READ_CHARS:
-            content = content[:MAX_FILE_READ_CHARS]
-            content += (
-                f'[...File "{file_path}" truncated at {MAX_FILE_READ_CHARS} characters]'
+            if start_line is not None or end_line is not None:
+                start_line = max(1, int(start_line or 1))
+                end_line = int(end_line) if end_line is not None else None
+                line_offset = _skip_lines(raw_file, start_line - 1)
+                text = io.TextIOWrapper(raw_file, encoding="utf-8", newline="")
+                content, next_line, next_offset = _read_lines(
+                    text, line_offset, start_line, end_line, limit
+                )
+                if next_line is not None:
+                    content += f'[...File "{file_path}" truncated at {limit} characters, continue with start_line={next_line}]'
+                elif next_offset is not None:
+                    content += f'[...File "{file_path}" truncated at {limit} characters, continue with offset={next_offset}]'
+                return content
+
+            offset = _seek_char_boundary(raw_file, max(0, int(offset or 0)))
+            # Keep line endings untranslated when byte offsets are handed back
+            ranged = offset != 0 or length is not None
+            text = io.TextIOWrapper(
+                raw_file, encoding="utf-8", newline="" if ranged else None
             )
+            content = text.read(limit + 1)
+
+        if len(content) > limit:
+            content = content[:limit]
+            if not ranged:
+                content += (
+                    f'[...File "{file_path}" truncated at {MAX_FILE_READ_CHARS} characters]'
+                )
+            else:
+                next_offset = offset + len(content.encode("utf-8"))
+                content += f'[...File "{file_path}" truncated at {limit} characters, continue with offset={next_offset}]'
 
         return content
 
@@ -44,19 +161,3 @@ def get_file_content(working_directory, file_path):
         return f'Error: Permission denied reading "{file_path}"'
     except Exception as e:
         return f"Error: {str(e)}"
-
-
-schema_get_file_content = types.FunctionDeclaration(
-    name="get_file_content",
-    description="Reads and returns the contents of a specified file, constrained to the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The path to the file to read, relative to the working directory.",
-            ),
-        },
-        required=["file_path"],
-    ),
-)
@@ -1,8 +1,75 @@
+import fnmatch
 import os
-from google.genai import types
+from config import MAX_LIST_ENTRIES
 
 
-def get_files_info(working_directory, directory="."):
+def _matches(relative_path, name, patterns):
+    return any(
+        fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(name, pattern)
+        for pattern in patterns
+    )
+
+
+def _walk(path, stat, relative_prefix, depth, max_depth, include, exclude, walked):
+    """Yield (relative_path, DirEntry, is_dir) in sorted, depth-first order.
+
+    stat is the directory's os.stat_result, taken before it is read. Each
+    directory read is added to walked as (path, stat).
+    """
+    try:
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except PermissionError:
+        return
+    walked.append((path, stat))
+
+    for entry in entries:
+        relative_path = os.path.join(relative_prefix, entry.name) if relative_prefix else entry.name
+        # Excluded directories are not descended into either
+        if exclude and _matches(relative_path, entry.name, exclude):
+            continue
+
+        is_dir = entry.is_dir()
+        if not include or _matches(relative_path, entry.name, include):
+            yield relative_path, entry, is_dir
+
+        # Symlinked directories are listed but not followed, to avoid cycles
+        if is_dir and not entry.is_symlink() and (max_depth < 1 or depth < max_depth):
+            # DirEntry caches the stat, listing the directory reuses it
+            yield from _walk(
+                entry.path, entry.stat(), relative_path, depth + 1, max_depth, include, exclude, walked
+            )
+
+
+def get_files_info(
+    working_directory,
+    directory=".",
+    max_depth=1,
+    include=None,
+    exclude=None,
+    limit=None,
+    cursor=None,
+):
+    return get_files_info_tracked(
+        working_directory, directory, max_depth, include, exclude, limit, cursor
+    )[0]
+
+
+def get_files_info_tracked(
+    working_directory,
+    directory=".",
+    max_depth=1,
+    include=None,
+    exclude=None,
+    limit=None,
+    cursor=None,
+):
+    """get_files_info, also returning the (path, os.stat_result) pairs the
+    listing depends on for tool_cache.tracked_tool: every directory the walk
+    read, which covers entries added, removed or renamed in it, and each
+    entry shown, which covers their sizes. Entries skipped by the cursor or
+    past the limit are not part of it. The dependencies are None for errors.
+    """
     try:
         # Convert working_directory to absolute path and normalize it
         working_directory = os.path.abspath(working_directory)
@@ -16,44 +83,42 @@ def get_files_info(working_directory, directory="."):
 
         # Check if the full path is within the working directory boundaries
         if not full_path.startswith(working_directory):
-            return f'Error: Cannot list "{directory}" as it is outside the permitted working directory'
+            return f'Error: Cannot list "{directory}" as it is outside the permitted working directory', None
 
         # Check if the directory exists and is actually a directory
         if not os.path.exists(full_path):
-            return f'Error: "{directory}" does not exist'
+            return f'Error: "{directory}" does not exist', None
 
         if not os.path.isdir(full_path):
-            return f'Error: "{directory}" is not a directory'
+            return f'Error: "{directory}" is not a directory', None
 
-        # List the contents of the directory
-        entries = os.listdir(full_path)
-        entries.sort()  # Sort alphabetically for consistent output
+        limit = MAX_LIST_ENTRIES if limit is None else max(1, min(int(limit), MAX_LIST_ENTRIES))
+        cursor = max(0, int(cursor or 0))
 
+        # List the contents of the directory, sorted alphabetically at each
+        # level for consistent output. The cursor is the number of entries
+        # returned by earlier pages; skipped entries are never stat'ed.
+        walked = []
+        shown = []
         result_lines = []
-        for entry in entries:
-            entry_path = os.path.join(full_path, entry)
-            is_dir = os.path.isdir(entry_path)
-            file_size = os.path.getsize(entry_path)
+        entries = _walk(
+            full_path, os.stat(full_path), "", 1, int(max_depth), include or [], exclude or [], walked
+        )
+        for index, (relative_path, entry, is_dir) in enumerate(entries):
+            if index < cursor:
+                continue
+            if len(result_lines) == limit:
+                result_lines.append(
+                    f"[...Listing truncated at {limit} entries, continue with cursor={index}]"
+                )
+                break
+            stat = entry.stat()
+            shown.append((entry.path, stat))
             result_lines.append(
-                f"- {entry}: file_size={file_size} bytes, is_dir={is_dir}"
+                f"- {relative_path}: file_size={stat.st_size} bytes, is_dir={is_dir}"
             )
 
-        return "\n".join(result_lines)
+        return "\n".join(result_lines), walked + shown
 
     except Exception as e:
-        return f"Error: {str(e)}"
-
-
-schema_get_files_info = types.FunctionDeclaration(
-    name="get_files_info",
-    description="Lists files in the specified directory along with their sizes, constrained to the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "directory": types.Schema(
-                type=types.Type.STRING,
-                description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
-            ),
-        },
-    ),
-)
+        return f"Error: {str(e)}", None
@@ -0,0 +1,59 @@
+import itertools
+import os
+from config import MAX_FILE_READ_CHARS
+from functions.outline_index import get_outline
+
+
+def get_symbol_source(working_directory, file_path, symbol):
+    try:
+        # Convert working_directory to absolute path and normalize it
+        working_directory = os.path.abspath(working_directory)
+        working_directory = os.path.normpath(working_directory)
+
+        # Create the full path by joining working_directory with the relative file_path
+        full_path = os.path.join(working_directory, file_path)
+
+        # Normalize the full path to resolve any ".." or "." components
+        full_path = os.path.normpath(full_path)
+
+        # Check if the full path is within the working directory boundaries
+        if not full_path.startswith(working_directory):
+            return f'Error: Cannot read "{file_path}" as it is outside the permitted working directory'
+
+        if not os.path.isfile(full_path):
+            return f'Error: File not found or is not a regular file: "{file_path}"'
+
+        if not file_path.endswith(".py"):
+            return f'Error: "{file_path}" is not a Python file.'
+
+        outline = get_outline(full_path)
+        if isinstance(outline, Exception):
+            return f'Error: Cannot parse "{file_path}": {outline}'
+
+        matches = [entry for entry in outline if entry["name"] == symbol]
+        if not matches:
+            # Allow the unqualified name when it is unambiguous
+            matches = [entry for entry in outline if entry["name"].split(".")[-1] == symbol]
+        if not matches:
+            return f'Error: Symbol "{symbol}" not found in "{file_path}"'
+        if len(matches) > 1:
+            names = ", ".join(entry["name"] for entry in matches)
+            return f'Error: Symbol "{symbol}" is ambiguous in "{file_path}": {names}'
+
+        entry = matches[0]
+        with open(full_path, "r") as file:
+            lines = itertools.islice(file, entry["start_line"] - 1, entry["end_line"])
+            content = "".join(lines)
+
+        if len(content) > MAX_FILE_READ_CHARS:
+            content = content[:MAX_FILE_READ_CHARS]
+            content += f'[...Symbol "{symbol}" truncated at {MAX_FILE_READ_CHARS} characters]'
+
+        return f"# {file_path}:{entry['start_line']}-{entry['end_line']}\n{content}"
+
+    except UnicodeDecodeError:
+        return f'Error: Cannot read "{file_path}" - file appears to be binary or uses an unsupported encoding'
+    except PermissionError:
+        return f'Error: Permission denied reading "{file_path}"'
+    except Exception as e:
+        return f"Error: {str(e)}"
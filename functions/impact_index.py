@@ -0,0 +1,243 @@
+import ast
+import fnmatch
+import os
+import threading
+from functions.outline_index import python_files
+
+# File names collected as test files, as unittest and pytest do by default
+TEST_FILE_PATTERNS = ("test*.py", "*_test.py")
+
+
+def is_test_file(full_path):
+    name = os.path.basename(full_path)
+    return any(fnmatch.fnmatch(name, pattern) for pattern in TEST_FILE_PATTERNS)
+
+
+def _is_test_case(node):
+    for base in node.bases:
+        name = base.attr if isinstance(base, ast.Attribute) else getattr(base, "id", "")
+        if name.endswith("TestCase"):
+            return True
+    return False
+
+
+def _parse(full_path):
+    """Return (imports, tests) for a Python file.
+
+    imports are (level, module, names) tuples as written in import
+    statements. tests are (name, kind) pairs, kind being "unittest" for
+    TestCase methods and "function" for pytest-style tests. A test file that
+    cannot be parsed yields the file itself as its only test, named "", so
+    running it reports the error.
+    """
+    with open(full_path, "rb") as file:
+        source = file.read()
+    try:
+        tree = ast.parse(source, filename=full_path)
+    except (SyntaxError, ValueError):
+        return (), [("", "function")] if is_test_file(full_path) else []
+
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend((0, alias.name, ()) for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            names = tuple(alias.name for alias in node.names)
+            imports.append((node.level, node.module or "", names))
+
+    tests = []
+    if is_test_file(full_path):
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                if node.name.startswith("test"):
+                    tests.append((node.name, "function"))
+            elif isinstance(node, ast.ClassDef):
+                test_case = _is_test_case(node)
+                if not (test_case or node.name.startswith("Test")):
+                    continue
+                for child in node.body:
+                    if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)) and (
+                        child.name.startswith("test")
+                    ):
+                        kind = "unittest" if test_case else "function"
+                        tests.append((f"{node.name}::{child.name}", kind))
+    return tuple(imports), tests
+
+
+def _stat_key(full_path):
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class ImpactIndex:
+    """Tests and the import graph of the Python files in a working directory.
+
+    Each test file that last passed remembers the state of every file it
+    depends on, so a later run can select just the test files whose own
+    source, imported modules (transitively) or conftest.py files changed.
+    Imports are resolved to files in the working directory only, and
+    generously: a module name is looked up next to the importing file and in
+    every directory above it, so an edit never goes unnoticed.
+    """
+
+    def __init__(self, working_directory):
+        self.working_directory = working_directory
+        self.lock = threading.Lock()
+        # full path -> (stat key, imports, tests)
+        self.files = {}
+        # test file -> {dependency full path: stat key} from its last clean run
+        self.passed = {}
+
+    def notify_write(self, full_path):
+        with self.lock:
+            for dependencies in self.passed.values():
+                if full_path in dependencies:
+                    dependencies[full_path] = None
+
+    def _scan(self):
+        current = {}
+        for full_path in python_files(self.working_directory):
+            key = _stat_key(full_path)
+            if key is None:
+                continue
+            cached = self.files.get(full_path)
+            if cached is None or cached[0] != key:
+                try:
+                    imports, tests = _parse(full_path)
+                except OSError:
+                    continue
+                cached = (key, imports, tests)
+            current[full_path] = cached
+        self.files = current
+
+    def _module_files(self, root, dotted):
+        """Files run by importing the dotted module from root: its package
+        __init__ files and the module itself."""
+        found = []
+        parts = dotted.split(".") if dotted else []
+        for depth in range(1, len(parts) + 1):
+            base = os.path.join(root, *parts[:depth])
+            init = os.path.join(base, "__init__.py")
+            if init in self.files:
+                found.append(init)
+            elif depth == len(parts) and base + ".py" in self.files:
+                found.append(base + ".py")
+        return found
+
+    def _roots(self, full_path):
+        directory = os.path.dirname(full_path)
+        while directory == self.working_directory or directory.startswith(
+            self.working_directory + os.sep
+        ):
+            yield directory
+            directory = os.path.dirname(directory)
+
+    def _direct_dependencies(self, full_path):
+        _, imports, _ = self.files[full_path]
+        dependencies = set()
+        for level, module, names in imports:
+            if level:
+                root = os.path.dirname(full_path)
+                for _ in range(level - 1):
+                    root = os.path.dirname(root)
+                roots = [root]
+            else:
+                roots = self._roots(full_path)
+            for root in roots:
+                dependencies.update(self._module_files(root, module))
+                # from package import name, where name may be a submodule
+                for name in names:
+                    dotted = f"{module}.{name}" if module else name
+                    dependencies.update(self._module_files(root, dotted))
+        dependencies.discard(full_path)
+        return dependencies
+
+    def _dependencies(self, test_file, direct):
+        seen = {test_file}
+        stack = [test_file]
+        while stack:
+            for dependency in direct(stack.pop()):
+                if dependency not in seen:
+                    seen.add(dependency)
+                    stack.append(dependency)
+        for root in self._roots(test_file):
+            conftest = os.path.join(root, "conftest.py")
+            if conftest in self.files:
+                seen.add(conftest)
+        return seen
+
+    def select(self, scope, run_all=False):
+        """Pick the test files under scope that need to run.
+
+        Returns (selected, unchanged, changed). selected is a list of
+        (test file, tests, dependency stat keys) for the files to run,
+        unchanged counts the test files skipped because nothing they depend
+        on changed since they last passed, and changed is the set of changed
+        files that caused a selection.
+        """
+        with self.lock:
+            self._scan()
+            direct_cache = {}
+
+            def direct(full_path):
+                if full_path not in direct_cache:
+                    direct_cache[full_path] = self._direct_dependencies(full_path)
+                return direct_cache[full_path]
+
+            selected = []
+            unchanged = 0
+            changed = set()
+            for full_path, (_, _, tests) in sorted(self.files.items()):
+                if not tests:
+                    continue
+                if full_path != scope and not full_path.startswith(scope + os.sep):
+                    continue
+
+                previous = self.passed.get(full_path)
+                if previous is not None and not run_all:
+                    stale = {
+                        path for path, key in previous.items() if _stat_key(path) != key
+                    }
+                    if not stale:
+                        unchanged += 1
+                        continue
+                    changed |= stale
+                dependencies = {
+                    dependency: self.files[dependency][0]
+                    for dependency in self._dependencies(full_path, direct)
+                }
+                selected.append((full_path, tests, dependencies))
+            return selected, unchanged, changed
+
+    def record(self, test_file, dependencies, passed):
+        """Remember the outcome of running a test file's selected tests."""
+        with self.lock:
+            if passed:
+                self.passed[test_file] = dependencies
+            else:
+                self.passed.pop(test_file, None)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_impact_index(working_directory):
+    working_directory = os.path.normpath(os.path.abspath(working_directory))
+    with _indexes_lock:
+        index = _indexes.get(working_directory)
+        if index is None:
+            index = _indexes[working_directory] = ImpactIndex(working_directory)
+        return index
+
+
+def notify_write(full_path):
+    """Mark full_path as changed in every impact index that covers it."""
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        if full_path.startswith(index.working_directory + os.sep):
+            index.notify_write(full_path)
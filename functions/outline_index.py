@@ -0,0 +1,83 @@
+import ast
+import os
+import threading
+
+# full path -> (mtime_ns, size, symbols or SyntaxError)
+_outlines = {}
+_outlines_lock = threading.Lock()
+
+
+def _signature(node):
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(base) for base in node.bases]
+        bases += [ast.unparse(keyword) for keyword in node.keywords]
+        return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    signature = f"{prefix} {node.name}({ast.unparse(node.args)})"
+    if node.returns is not None:
+        signature += f" -> {ast.unparse(node.returns)}"
+    return signature
+
+
+def _collect(body, parent, depth, symbols):
+    for node in body:
+        if not isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        name = f"{parent}.{node.name}" if parent else node.name
+        # Decorators belong to the symbol's source
+        start_line = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        symbols.append(
+            {
+                "name": name,
+                "signature": _signature(node),
+                "start_line": start_line,
+                "end_line": node.end_lineno,
+                "depth": depth,
+            }
+        )
+        _collect(node.body, name, depth + 1, symbols)
+
+
+def _parse(full_path):
+    with open(full_path, "rb") as file:
+        source = file.read()
+    try:
+        tree = ast.parse(source, filename=full_path)
+    except (SyntaxError, ValueError) as e:
+        return e
+    symbols = []
+    _collect(tree.body, "", 0, symbols)
+    return symbols
+
+
+def get_outline(full_path):
+    """Return the symbols defined in a Python file, or the SyntaxError.
+
+    Outlines are cached per file and only re-parsed when its mtime or size
+    changes. Each symbol is a dict with name (qualified, e.g.
+    "Calculator.evaluate"), signature, start_line, end_line and depth.
+    """
+    stat = os.stat(full_path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _outlines_lock:
+        cached = _outlines.get(full_path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    outline = _parse(full_path)
+    with _outlines_lock:
+        _outlines[full_path] = (key, outline)
+    return outline
+
+
+def python_files(full_path):
+    """Yield the .py files under full_path (or full_path itself) in sorted order."""
+    if os.path.isfile(full_path):
+        yield full_path
+        return
+    for root, dirs, file_names in os.walk(full_path):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__" and not d.startswith("."))
+        for name in sorted(file_names):
+            if name.endswith(".py"):
+                yield os.path.join(root, name)
@@ -0,0 +1,102 @@
+import os
+import queue
+import re
+import threading
+from config import PREFETCH_LISTED_FILES, PREFETCH_MAX_FILE_BYTES, PREFETCH_MAX_FILES
+from tracing import span
+
+# How get_files_info lists a file: "- <path>: file_size=<n> bytes, is_dir=False"
+LISTED_FILE = re.compile(r"^- (.+): file_size=(\d+) bytes, is_dir=False$", re.MULTILINE)
+
+
+def listed_files(listing):
+    """Return the (relative path, size) of each file in a get_files_info listing."""
+    return [(match.group(1), int(match.group(2))) for match in LISTED_FILE.finditer(listing)]
+
+
+class Prefetcher:
+    """Runs speculative tool calls one at a time on a background thread.
+
+    Each call goes through a cached tool's prefetch, so its result waits in
+    the tool cache for the call the model is expected to make next.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, cached_function, working_directory, args):
+        with self.lock:
+            if self.thread is None:
+                # A daemon thread, so pending prefetches never delay exit
+                self.thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+                self.thread.start()
+        self.queue.put((cached_function, working_directory, args))
+
+    def _run(self):
+        while True:
+            cached_function, working_directory, args = self.queue.get()
+            try:
+                with span("prefetch", "tool", tool=cached_function.__name__, **args) as prefetch_span:
+                    prefetch_span["stored"] = cached_function.prefetch(working_directory, **args)
+            except Exception:
+                # A failed guess costs nothing, the real call reports errors
+                pass
+            finally:
+                self.queue.task_done()
+
+    def join(self):
+        """Wait for every submitted prefetch to finish."""
+        self.queue.join()
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher():
+    """Return the process-wide prefetcher, creating it on first use."""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher()
+        return _prefetcher
+
+
+def prefetching_listing(list_function, read_function, enabled=PREFETCH_LISTED_FILES):
+    """Wrap get_files_info so the small files in each listing are read into
+    the tool cache through read_function (a cached get_file_content) in the
+    background, since reading some of them is usually the model's next step."""
+    if not enabled:
+        return list_function
+
+    def wrapper(working_directory, **args):
+        # Resolved now, the prefetches run later and the daemon changes
+        # directory between requests
+        working_directory = os.path.abspath(working_directory)
+        listing = list_function(working_directory=working_directory, **args)
+        if isinstance(listing, str) and not listing.startswith("Error:"):
+            directory = str(args.get("directory", "."))
+            candidates = [
+                relative_path
+                for relative_path, size in listed_files(listing)
+                if size <= PREFETCH_MAX_FILE_BYTES
+            ]
+            prefetcher = get_prefetcher()
+            for relative_path in candidates[:PREFETCH_MAX_FILES]:
+                file_path = os.path.normpath(os.path.join(directory, relative_path))
+                prefetcher.submit(read_function, working_directory, {"file_path": file_path})
+        return listing
+
+    wrapper.__name__ = list_function.__name__
+    return wrapper
+
+
+def format_prefetch_stats(stats):
+    """Summarize the prefetch counts of tool_cache.stats() on one line."""
+    rate = stats["prefetch_hits"] / stats["prefetches"] if stats["prefetches"] else 0.0
+    return (
+        f"Prefetch: {stats['prefetches']} files read ahead, {stats['prefetch_hits']} used "
+        f"({rate:.0%} hit rate), {stats['prefetch_wasted_bytes']} bytes wasted"
+    )
@@ -0,0 +1,164 @@
+# Warm worker interpreter for the "worker_pool" run_python_file backend.
+#
+# Started once by functions.python_worker_pool, it imports the configured
+# modules and then serves runs read as JSON lines from stdin. Each run is
+# forked from this warm process, so the script gets the preloaded modules for
+# free but never sees state left behind by earlier runs.
+import json
+import os
+import runpy
+import select
+import sys
+import time
+import traceback
+
+# Run as a script, so this directory is on the path
+from sandbox import (
+    OUTPUT_GRACE_SECONDS,
+    READ_CHUNK_BYTES,
+    BoundedOutput,
+    apply_limits,
+    kill_process_group,
+    usage_from_rusage,
+)
+
+
+def _run_main(full_path):
+    try:
+        runpy.run_path(full_path, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException as e:
+        # Hide the worker and runpy frames, like a plain `python file.py` would
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != full_path:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__)
+        return 1
+    return 0
+
+
+def _run_child(job, stdout_fd, stderr_fd):
+    code = 1
+    try:
+        # Own process group, so a timeout can kill anything the script spawns
+        os.setsid()
+        apply_limits(job.get("limits"))
+        os.chdir(job["working_directory"])
+
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        sys.stdin = open(os.devnull)
+
+        # The script's own sandbox.py, if it has one, must not resolve to ours
+        sys.modules.pop("sandbox", None)
+
+        full_path = os.path.join(job["working_directory"], job["file_path"])
+        sys.argv = [job["file_path"]] + job["args"]
+        sys.path[0] = os.path.dirname(full_path)
+        code = _run_main(full_path)
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def _read_ready(outputs, timeout):
+    """Read whatever the pipes in outputs (fd -> BoundedOutput) have ready
+    within timeout, closing and dropping the ones that reached EOF."""
+    if not outputs:
+        time.sleep(timeout)
+        return
+    ready, _, _ = select.select(list(outputs), [], [], timeout)
+    for fd in ready:
+        data = os.read(fd, READ_CHUNK_BYTES)
+        if data:
+            outputs[fd].write(data)
+        else:
+            os.close(fd)
+            del outputs[fd]
+
+
+def _drain(outputs, seconds):
+    deadline = time.monotonic() + seconds
+    while outputs and time.monotonic() < deadline:
+        _read_ready(outputs, max(0, deadline - time.monotonic()))
+
+
+def run_job(job):
+    budget = job.get("output_budget", 10000)
+    stdout = BoundedOutput(budget)
+    stderr = BoundedOutput(budget)
+    stdout_read, stdout_write = os.pipe()
+    stderr_read, stderr_write = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    pid = os.fork()
+    if pid == 0:
+        os.close(stdout_read)
+        os.close(stderr_read)
+        _run_child(job, stdout_write, stderr_write)
+    os.close(stdout_write)
+    os.close(stderr_write)
+
+    # The output is read as it comes, so only the budget is ever held, and
+    # only the script's own exit counts against the deadline
+    outputs = {stdout_read: stdout, stderr_read: stderr}
+    deadline = time.monotonic() + job["timeout"]
+    timed_out = False
+    while True:
+        waited_pid, status, usage = os.wait4(pid, os.WNOHANG)
+        if waited_pid:
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            kill_process_group(pid)
+            _, status, usage = os.wait4(pid, 0)
+            timed_out = True
+            break
+        _read_ready(outputs, min(remaining, 0.005 if not outputs else 0.05))
+
+    # Processes the script left behind may still hold the output open
+    _drain(outputs, OUTPUT_GRACE_SECONDS)
+    if outputs:
+        kill_process_group(pid)
+        _drain(outputs, OUTPUT_GRACE_SECONDS)
+        for fd in outputs:
+            os.close(fd)
+
+    cpu_seconds, peak_rss_bytes = usage_from_rusage(usage)
+    return {
+        "timed_out": timed_out,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "returncode": os.waitstatus_to_exitcode(status),
+        "cpu_seconds": cpu_seconds,
+        "peak_rss_bytes": peak_rss_bytes,
+    }
+
+
+def main():
+    for module_name in sys.argv[1:]:
+        try:
+            __import__(module_name)
+        except ImportError:
+            pass
+
+    for line in sys.stdin:
+        result = run_job(json.loads(line))
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import atexit
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+from config import (
+    PYTHON_WORKER_MAX_RUNS,
+    PYTHON_WORKER_POOL_SIZE,
+    PYTHON_WORKER_PRELOAD,
+)
+from functions.sandbox import RunResult
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_worker.py")
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+class _Worker:
+    def __init__(self, preload):
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT, *preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.runs = 0
+
+    def run(self, job):
+        self.runs += 1
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerCrashed(str(e))
+        if not line:
+            raise WorkerCrashed(f"worker exited with code {self.process.poll()}")
+        return json.loads(line)
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class WorkerPool:
+    """A pool of pre-warmed interpreters that run Python files as __main__.
+
+    Workers are started up front so their imports overlap with other work.
+    A worker is replaced after max_runs runs, or as soon as it crashes.
+    """
+
+    def __init__(
+        self,
+        size=PYTHON_WORKER_POOL_SIZE,
+        max_runs=PYTHON_WORKER_MAX_RUNS,
+        preload=PYTHON_WORKER_PRELOAD,
+    ):
+        self.max_runs = max_runs
+        self.preload = preload
+        self.idle = queue.Queue()
+        for _ in range(size):
+            self.idle.put(_Worker(preload))
+
+    def run(self, working_directory, file_path, args, timeout, limits=None, output_budget=10000):
+        """Run file_path like subprocess.run would and return a RunResult.
+
+        limits and output_budget are applied as by functions.sandbox. Raises
+        subprocess.TimeoutExpired, with the output captured so far, if the
+        run takes longer than timeout.
+        """
+        job = {
+            "working_directory": os.path.abspath(working_directory),
+            "file_path": file_path,
+            "args": list(args),
+            "timeout": timeout,
+            "limits": limits,
+            "output_budget": output_budget,
+        }
+
+        worker = self.idle.get()
+        try:
+            result = worker.run(job)
+        except WorkerCrashed:
+            # Replace the crashed worker and give the run one more chance
+            worker.close()
+            worker = _Worker(self.preload)
+            result = worker.run(job)
+        finally:
+            if worker.process.poll() is not None or worker.runs >= self.max_runs:
+                worker.close()
+                worker = _Worker(self.preload)
+            self.idle.put(worker)
+
+        command = [sys.executable, file_path] + list(args)
+        if result["timed_out"]:
+            raise subprocess.TimeoutExpired(
+                command, timeout, output=result["stdout"], stderr=result["stderr"]
+            )
+        return RunResult(
+            command,
+            result["returncode"],
+            result["stdout"],
+            result["stderr"],
+            result["cpu_seconds"],
+            result["peak_rss_bytes"],
+        )
+
+    def close(self):
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """Return the process-wide worker pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+            atexit.register(_pool.close)
+        return _pool
@@ -1,7 +1,42 @@
 import os
+import signal
 import subprocess
 import sys
-from google.genai import types
+from config import (
+    RUN_PYTHON_BACKEND,
+    RUN_PYTHON_CPU_SECONDS,
+    RUN_PYTHON_MAX_ADDRESS_SPACE,
+    RUN_PYTHON_MAX_OPEN_FILES,
+    RUN_PYTHON_MAX_OUTPUT_BYTES,
+    RUN_PYTHON_TIMEOUT,
+)
+from functions.sandbox import SandboxedProcess
+from tracing import span
+
+
+def _record_usage(attributes, result):
+    attributes["cpu_seconds"] = result.cpu_seconds
+    attributes["peak_rss_bytes"] = result.peak_rss_bytes
+
+
+def _signal_name(number):
+    try:
+        name = signal.Signals(number).name
+    except ValueError:
+        return f"signal {number}"
+    if name == "SIGXCPU":
+        return f"{name} (CPU time limit of {RUN_PYTHON_CPU_SECONDS} s exceeded)"
+    return name
+
+
+def _format_usage(result):
+    # Only shown for failed runs, where hitting a limit is a likely cause
+    parts = []
+    if result.cpu_seconds is not None:
+        parts.append(f"{result.cpu_seconds:.2f} s CPU")
+    if result.peak_rss_bytes is not None:
+        parts.append(f"{result.peak_rss_bytes / 1024 / 1024:.1f} MB peak memory")
+    return "Resource usage: " + (", ".join(parts) or "unknown")
 
 
 def run_python_file(working_directory, file_path, args=[]):
@@ -28,13 +63,37 @@ def run_python_file(working_directory, file_path, args=[]):
         if not file_path.endswith(".py"):
             return f'Error: "{file_path}" is not a Python file.'
 
-        result = subprocess.run(
-            [sys.executable, file_path] + args,
-            capture_output=True,
-            text=True,
-            cwd=working_directory,
-            timeout=30,
-        )
+        limits = {
+            "cpu_seconds": RUN_PYTHON_CPU_SECONDS,
+            "address_space_bytes": RUN_PYTHON_MAX_ADDRESS_SPACE,
+            "open_files": RUN_PYTHON_MAX_OPEN_FILES,
+        }
+        if RUN_PYTHON_BACKEND == "worker_pool" and hasattr(os, "fork"):
+            from functions.python_worker_pool import get_worker_pool
+
+            with span("run_python_file.worker_run", "subprocess") as attributes:
+                result = get_worker_pool().run(
+                    working_directory,
+                    file_path,
+                    args,
+                    timeout=RUN_PYTHON_TIMEOUT,
+                    limits=limits,
+                    output_budget=RUN_PYTHON_MAX_OUTPUT_BYTES,
+                )
+                _record_usage(attributes, result)
+        else:
+            # Spawning and running are timed separately to show startup cost
+            command = [sys.executable, file_path] + args
+            with span("run_python_file.spawn", "subprocess"):
+                process = SandboxedProcess(
+                    command,
+                    working_directory,
+                    limits=limits,
+                    output_budget=RUN_PYTHON_MAX_OUTPUT_BYTES,
+                )
+            with span("run_python_file.run", "subprocess") as attributes:
+                result = process.wait(RUN_PYTHON_TIMEOUT)
+                _record_usage(attributes, result)
 
         output = []
 
@@ -42,34 +101,22 @@ def run_python_file(working_directory, file_path, args=[]):
             output.append(f"STDOUT:\n{result.stdout}")
         if result.stderr:
             output.append(f"STDERR:\n{result.stderr}")
-        if result.returncode != 0:
+        if result.returncode < 0:
+            output.append(f"Process was killed by {_signal_name(-result.returncode)}")
+            output.append(_format_usage(result))
+        elif result.returncode != 0:
             output.append(f"Process exited with code {result.returncode}")
+            output.append(_format_usage(result))
         if not output:
             return "No output produced."
         return "\n".join(output)
 
-    except subprocess.TimeoutExpired:
-        return f"Error: executing Python file: Process timed out after 30 seconds"
+    except subprocess.TimeoutExpired as e:
+        message = f"Error: executing Python file: Process timed out after {RUN_PYTHON_TIMEOUT} seconds"
+        if e.output:
+            message += f"\nSTDOUT:\n{e.output}"
+        if e.stderr:
+            message += f"\nSTDERR:\n{e.stderr}"
+        return message
     except Exception as e:
         return f"Error: executing Python file: {e}"
-
-
-schema_run_python_file = types.FunctionDeclaration(
-    name="run_python_file",
-    description="Executes a Python file with optional command-line arguments, constrained to the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The path to the Python file to execute, relative to the working directory.",
-            ),
-            "args": types.Schema(
-                type=types.Type.ARRAY,
-                description="Optional command-line arguments to pass to the Python script.",
-                items=types.Schema(type=types.Type.STRING),
-            ),
-        },
-        required=["file_path"],
-    ),
-)
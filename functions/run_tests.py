@@ -0,0 +1,182 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from config import (
+    RUN_PYTHON_MAX_ADDRESS_SPACE,
+    RUN_PYTHON_MAX_OPEN_FILES,
+    RUN_PYTHON_MAX_OUTPUT_BYTES,
+    RUN_TESTS_MAX_FAILURES_SHOWN,
+    RUN_TESTS_MAX_WORKERS,
+    RUN_TESTS_MIN_TESTS_PER_WORKER,
+    RUN_TESTS_TIMEOUT,
+)
+from functions.impact_index import get_impact_index
+from functions.sandbox import SandboxedProcess
+from tracing import span
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_tests_worker.py")
+
+
+def _split(tests, workers):
+    """Cut the (relative path, name, kind) tests into contiguous chunks, so a
+    worker imports as few test files as possible, and group each chunk by file."""
+    size = -(-len(tests) // workers)
+    chunks = []
+    for start in range(0, len(tests), size):
+        files = {}
+        for relative_path, name, kind in tests[start : start + size]:
+            files.setdefault(relative_path, []).append((name, kind))
+        chunks.append(list(files.items()))
+    return chunks
+
+
+def _reported_test(result_id):
+    # Subtests and parametrized pytest tests report ids that extend the test's
+    return result_id.split(" ")[0].split("[")[0]
+
+
+def _test_id(relative_path, name):
+    return f"{relative_path}::{name}" if name else relative_path
+
+
+def _run_workers(working_directory, chunks):
+    """Run each chunk in a worker process and return (results, problems):
+    the result records of every worker, and a note per worker that did not
+    finish cleanly."""
+    limits = {
+        "cpu_seconds": RUN_TESTS_TIMEOUT,
+        "address_space_bytes": RUN_PYTHON_MAX_ADDRESS_SPACE,
+        "open_files": RUN_PYTHON_MAX_OPEN_FILES,
+    }
+    results = []
+    problems = []
+    with tempfile.TemporaryDirectory() as directory:
+        workers = []
+        with span("run_tests.spawn", "subprocess", workers=len(chunks)):
+            for index, files in enumerate(chunks):
+                job_path = os.path.join(directory, f"job{index}.json")
+                results_path = os.path.join(directory, f"results{index}.jsonl")
+                with open(job_path, "w") as file:
+                    json.dump({"working_directory": working_directory, "files": files}, file)
+                command = [sys.executable, WORKER_SCRIPT, job_path, results_path]
+                process = SandboxedProcess(
+                    command,
+                    working_directory,
+                    limits=limits,
+                    output_budget=RUN_PYTHON_MAX_OUTPUT_BYTES,
+                )
+                workers.append((process, results_path))
+
+        deadline = time.monotonic() + RUN_TESTS_TIMEOUT
+        with span("run_tests.run", "subprocess"):
+            for process, results_path in workers:
+                try:
+                    result = process.wait(max(0, deadline - time.monotonic()))
+                    if result.returncode != 0:
+                        stderr = result.stderr.strip().splitlines()
+                        problems.append(
+                            f"worker exited with code {result.returncode}"
+                            + (f": {stderr[-1]}" if stderr else "")
+                        )
+                except subprocess.TimeoutExpired:
+                    problems.append(f"worker timed out after {RUN_TESTS_TIMEOUT} seconds")
+
+                if os.path.exists(results_path):
+                    with open(results_path) as file:
+                        for line in file:
+                            # The last line may be cut short by a killed worker
+                            try:
+                                results.append(json.loads(line))
+                            except json.JSONDecodeError:
+                                pass
+    return results, problems
+
+
+def run_tests(working_directory, path=".", run_all=False):
+    try:
+        # Convert working_directory to absolute path and normalize it
+        working_directory = os.path.abspath(working_directory)
+        working_directory = os.path.normpath(working_directory)
+
+        # Create the full path by joining working_directory with the relative path
+        full_path = os.path.join(working_directory, path)
+
+        # Normalize the full path to resolve any ".." or "." components
+        full_path = os.path.normpath(full_path)
+
+        # Check if the full path is within the working directory boundaries
+        if not full_path.startswith(working_directory):
+            return f'Error: Cannot run tests in "{path}" as it is outside the permitted working directory'
+
+        if not os.path.exists(full_path):
+            return f'Error: "{path}" does not exist'
+
+        index = get_impact_index(working_directory)
+        with span("run_tests.select", "tool"):
+            selected, unchanged, changed = index.select(full_path, run_all)
+
+        if not selected:
+            if unchanged:
+                return (
+                    f"No tests to run: none of the {unchanged} test files under "
+                    f'"{path}" depend on a file changed since they last passed. '
+                    "Pass run_all=true to run them anyway."
+                )
+            return f'No unittest or pytest tests found under "{path}".'
+
+        tests = []
+        for test_file, file_tests, _ in selected:
+            relative_path = os.path.relpath(test_file, working_directory)
+            tests.extend((relative_path, name, kind) for name, kind in file_tests)
+        workers = max(1, min(RUN_TESTS_MAX_WORKERS, len(tests) // RUN_TESTS_MIN_TESTS_PER_WORKER))
+
+        results, problems = _run_workers(working_directory, _split(tests, workers))
+
+        # Tests a killed or crashed worker never reported on count as errors
+        reason = "; ".join(problems) or "worker ended early"
+        reported = {_reported_test(result["id"]) for result in results}
+        for relative_path, name, _ in tests:
+            test_id = _test_id(relative_path, name)
+            if test_id not in reported:
+                results.append(
+                    {"id": test_id, "outcome": "error", "message": f"did not finish: {reason}"}
+                )
+
+        failing_files = set()
+        for result in results:
+            if result["outcome"] in ("failed", "error"):
+                failing_files.add(_reported_test(result["id"]).split("::")[0])
+        for test_file, _, dependencies in selected:
+            relative_path = os.path.relpath(test_file, working_directory)
+            index.record(test_file, dependencies, relative_path not in failing_files)
+
+        counts = {}
+        for result in results:
+            counts[result["outcome"]] = counts.get(result["outcome"], 0) + 1
+        summary = ", ".join(
+            f"{counts.get(outcome, 0)} {outcome}"
+            for outcome in ("passed", "failed", "error", "skipped")
+            if counts.get(outcome) or outcome == "passed"
+        )
+
+        # Timings are left to the trace, so identical runs give identical output
+        lines = [f"Ran {len(results)} tests from {len(selected)} test files: {summary}"]
+        if changed:
+            names = sorted(os.path.relpath(changed_path, working_directory) for changed_path in changed)
+            lines.append(f"Selected because these files changed: {', '.join(names)}")
+        if unchanged:
+            lines.append(
+                f"Skipped {unchanged} test files whose dependencies are unchanged since they last passed"
+            )
+        failures = [result for result in results if result["outcome"] in ("failed", "error")]
+        for result in failures[:RUN_TESTS_MAX_FAILURES_SHOWN]:
+            lines.append(f"{result['outcome'].upper()} {result['id']}: {result['message']}")
+        if len(failures) > RUN_TESTS_MAX_FAILURES_SHOWN:
+            lines.append(f"[...{len(failures) - RUN_TESTS_MAX_FAILURES_SHOWN} more failures not shown]")
+        return "\n".join(lines)
+
+    except Exception as e:
+        return f"Error: running tests: {e}"
@@ -0,0 +1,213 @@
+# Test worker process for the run_tests tool.
+#
+# Started by functions.run_tests with a JSON job file naming the tests to run
+# and a results file. Each finished test is appended to the results file as
+# a JSON line right away, so the tests that completed are known even if the
+# worker is killed. TestCase tests run under unittest. pytest-style tests run
+# under pytest when it is installed; without it, tests that take no
+# arguments are called directly and the others are skipped.
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import time
+import traceback
+import unittest
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+MESSAGE_CHARS = 500
+
+
+def _describe(full_path, exc_info):
+    """One line naming the exception and the test file line it came from."""
+    exc_type, exc, tb = exc_info
+    message = "".join(traceback.format_exception_only(exc_type, exc)).strip()
+    frames = [frame for frame in traceback.extract_tb(tb) if frame.filename == full_path]
+    if frames:
+        message = f"line {frames[-1].lineno}: {message}"
+    message = " ".join(message.split())
+    if len(message) > MESSAGE_CHARS:
+        message = message[: MESSAGE_CHARS - 3] + "..."
+    return message
+
+
+class _Results:
+    def __init__(self, file):
+        self.file = file
+
+    def record(self, test_id, outcome, message="", duration=0.0):
+        record = {
+            "id": test_id,
+            "outcome": outcome,
+            "message": message,
+            "duration": duration,
+        }
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+
+class _UnittestResult(unittest.TestResult):
+    def __init__(self, results, relative_path, full_path):
+        super().__init__()
+        self.results = results
+        self.relative_path = relative_path
+        self.full_path = full_path
+        self.started = 0.0
+
+    def _id(self, test):
+        method = getattr(test, "_testMethodName", None)
+        if method is None:
+            # setUpClass and setUpModule errors are reported on a placeholder
+            return f"{self.relative_path}::{test.description}"
+        return f"{self.relative_path}::{type(test).__name__}::{method}"
+
+    def _record(self, test, outcome, message=""):
+        duration = time.perf_counter() - self.started
+        self.results.record(self._id(test), outcome, message, duration)
+
+    def startTest(self, test):
+        super().startTest(test)
+        self.started = time.perf_counter()
+
+    def addSuccess(self, test):
+        self._record(test, "passed")
+
+    def addFailure(self, test, err):
+        self._record(test, "failed", _describe(self.full_path, err))
+
+    def addError(self, test, err):
+        self._record(test, "error", _describe(self.full_path, err))
+
+    def addSkip(self, test, reason):
+        self._record(test, "skipped", reason)
+
+    def addExpectedFailure(self, test, err):
+        self._record(test, "passed")
+
+    def addUnexpectedSuccess(self, test):
+        self._record(test, "failed", "unexpected success")
+
+    def addSubTest(self, test, subtest, err):
+        if err is not None:
+            outcome = "failed" if issubclass(err[0], test.failureException) else "error"
+            self.results.record(
+                f"{self._id(test)} {subtest._subDescription()}",
+                outcome,
+                _describe(self.full_path, err),
+            )
+
+
+def _load_module(relative_path, full_path):
+    # Imported the way running the file as a script would find its imports
+    sys.path.insert(0, os.path.dirname(full_path))
+    module_name = relative_path[:-3].replace(os.sep, ".")
+    spec = importlib.util.spec_from_file_location(module_name, full_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _call_directly(module, name):
+    if "::" in name:
+        class_name, method_name = name.split("::")
+        test = getattr(getattr(module, class_name)(), method_name)
+    else:
+        test = getattr(module, name)
+    if inspect.iscoroutinefunction(test) or inspect.signature(test).parameters:
+        return "needs pytest for its fixtures, parameters or event loop"
+    test()
+    return None
+
+
+def _run_file(results, working_directory, relative_path, tests):
+    full_path = os.path.join(working_directory, relative_path)
+    try:
+        module = _load_module(relative_path, full_path)
+    except BaseException as e:
+        message = "import failed: " + _describe(full_path, (type(e), e, e.__traceback__))
+        for name, _ in tests:
+            test_id = f"{relative_path}::{name}" if name else relative_path
+            results.record(test_id, "error", message)
+        return
+
+    unittest_names = [name for name, kind in tests if kind == "unittest"]
+    if unittest_names:
+        loader = unittest.TestLoader()
+        suite = unittest.TestSuite(
+            loader.loadTestsFromName(name.replace("::", "."), module)
+            for name in unittest_names
+        )
+        suite.run(_UnittestResult(results, relative_path, full_path))
+
+    function_names = [name for name, kind in tests if kind == "function" and name]
+    if function_names and pytest is not None:
+        _run_pytest(results, working_directory, relative_path, function_names)
+        return
+    for name in function_names:
+        test_id = f"{relative_path}::{name}"
+        started = time.perf_counter()
+        try:
+            reason = _call_directly(module, name)
+        except Exception as e:
+            outcome = "failed" if isinstance(e, AssertionError) else "error"
+            message = _describe(full_path, (type(e), e, e.__traceback__))
+        else:
+            outcome = "skipped" if reason else "passed"
+            message = reason or ""
+        results.record(test_id, outcome, message, time.perf_counter() - started)
+
+
+class _PytestReporter:
+    def __init__(self, results):
+        self.results = results
+
+    def pytest_runtest_logreport(self, report):
+        if report.when != "call" and report.passed:
+            return
+        if report.passed:
+            outcome = "passed"
+        elif report.skipped:
+            outcome = "skipped"
+        else:
+            outcome = "failed" if report.when == "call" else "error"
+        message = ""
+        crash = getattr(report.longrepr, "reprcrash", None)
+        if crash is not None:
+            message = f"line {crash.lineno}: {crash.message}"
+        message = " ".join(message.split())[:MESSAGE_CHARS]
+        self.results.record(report.nodeid, outcome, message, report.duration)
+
+
+def _run_pytest(results, working_directory, relative_path, names):
+    node_ids = [f"{relative_path}::{name}" for name in names]
+    pytest.main(
+        ["-q", "-p", "no:cacheprovider", "--rootdir", working_directory, *node_ids],
+        plugins=[_PytestReporter(results)],
+    )
+
+
+def main():
+    job_path, results_path = sys.argv[1:3]
+    with open(job_path) as file:
+        job = json.load(file)
+    working_directory = job["working_directory"]
+    os.chdir(working_directory)
+
+    # Imports resolve from the working directory, as under `python -m
+    # unittest` or `python -m pytest`, instead of from this script's directory
+    sys.path[0] = working_directory
+
+    with open(results_path, "a") as file:
+        results = _Results(file)
+        for relative_path, tests in job["files"]:
+            _run_file(results, working_directory, relative_path, tests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# Resource-limited process execution for run_python_file.
+#
+# Kept free of config imports so the worker_pool backend's worker script,
+# which runs with only this directory on its path, can use it as well.
+import functools
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+READ_CHUNK_BYTES = 65536
+
+# Seconds output is still read after the script exits, for processes it left
+# running that hold its stdout or stderr open, before they are killed
+OUTPUT_GRACE_SECONDS = 0.2
+
+
+class BoundedOutput:
+    """Keeps the first and last bytes of a stream within a byte budget.
+
+    Half of the budget holds the head of the stream, the other half is a ring
+    of its most recent bytes, and everything in between is only counted.
+    """
+
+    def __init__(self, budget):
+        self.head_size = budget // 2
+        self.tail_size = budget - self.head_size
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, data):
+        self.total += len(data)
+        room = self.head_size - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data and self.tail_size:
+            self.tail += data[-self.tail_size:]
+            if len(self.tail) > self.tail_size:
+                del self.tail[: len(self.tail) - self.tail_size]
+
+    @property
+    def omitted(self):
+        return self.total - len(self.head) - len(self.tail)
+
+    def getvalue(self):
+        head = self.head.decode(errors="replace")
+        tail = self.tail.decode(errors="replace")
+        if not self.omitted:
+            return head + tail
+        return f"{head}\n[... {self.omitted} bytes omitted ...]\n{tail}"
+
+
+class RunResult(subprocess.CompletedProcess):
+    """A CompletedProcess that also carries the run's resource usage."""
+
+    def __init__(self, args, returncode, stdout, stderr, cpu_seconds=None, peak_rss_bytes=None):
+        super().__init__(args, returncode, stdout, stderr)
+        self.cpu_seconds = cpu_seconds
+        self.peak_rss_bytes = peak_rss_bytes
+
+
+def apply_limits(limits):
+    """Set the soft and hard rlimits of the current process.
+
+    limits maps "cpu_seconds", "address_space_bytes" and "open_files" to a
+    value, or to None to leave that limit as it is. Limits are never raised
+    above the current hard limit.
+    """
+    if resource is None or not limits:
+        return
+    for name, rlimit in (
+        ("cpu_seconds", resource.RLIMIT_CPU),
+        ("address_space_bytes", resource.RLIMIT_AS),
+        ("open_files", resource.RLIMIT_NOFILE),
+    ):
+        value = limits.get(name)
+        if value is None:
+            continue
+        # The CPU limit sends SIGXCPU at the soft limit and SIGKILL a second
+        # later at the hard one, in case the script ignores the signal
+        ceiling = value + 1 if rlimit == resource.RLIMIT_CPU else value
+        _, hard = resource.getrlimit(rlimit)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+            ceiling = min(ceiling, hard)
+        resource.setrlimit(rlimit, (value, ceiling))
+
+
+def usage_from_rusage(usage):
+    """Return (cpu_seconds, peak_rss_bytes) from a struct_rusage."""
+    # ru_maxrss is in kilobytes, except on macOS where it is in bytes
+    scale = 1 if sys.platform == "darwin" else 1024
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss * scale
+
+
+def kill_process_group(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class SandboxedProcess:
+    """A child process in its own process group, under rlimits, whose output
+    is streamed into BoundedOutput buffers instead of being held in full.
+
+    Starting and waiting are separate steps so callers can time the spawn.
+    """
+
+    def __init__(self, command, cwd, limits=None, output_budget=10000):
+        self.command = command
+        self.stdout = BoundedOutput(output_budget)
+        self.stderr = BoundedOutput(output_budget)
+        # Only setrlimit calls run between fork and exec, which keeps
+        # preexec_fn safe even though tool calls run on several threads
+        preexec_fn = None
+        if limits and resource is not None:
+            preexec_fn = functools.partial(apply_limits, limits)
+
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+            start_new_session=True,
+            preexec_fn=preexec_fn,
+        )
+        self.readers = [
+            threading.Thread(target=self._drain, args=(pipe, output), daemon=True)
+            for pipe, output in (
+                (self.process.stdout, self.stdout),
+                (self.process.stderr, self.stderr),
+            )
+        ]
+        for reader in self.readers:
+            reader.start()
+
+    @staticmethod
+    def _drain(pipe, output):
+        with pipe:
+            while True:
+                data = os.read(pipe.fileno(), READ_CHUNK_BYTES)
+                if not data:
+                    break
+                output.write(data)
+
+    def _wait_for_exit(self, deadline):
+        # Only the script's own exit counts against the deadline, output
+        # held open by processes it left behind is dealt with afterwards.
+        # The readers normally finish when it exits, so waiting on them
+        # notices the exit at once; after that the exit status is polled.
+        delay = 0.001
+        while True:
+            if hasattr(os, "wait4"):
+                pid, status, usage = os.wait4(self.process.pid, os.WNOHANG)
+                if pid:
+                    self.process.returncode = os.waitstatus_to_exitcode(status)
+                    return usage
+            elif self.process.poll() is not None:
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            alive = [reader for reader in self.readers if reader.is_alive()]
+            if alive:
+                alive[0].join(min(remaining, 0.05))
+            else:
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, 0.05)
+
+    def _join_readers(self):
+        """Let the readers reach the end of the output, killing whatever is
+        left of the process group if it holds the output open. A process
+        that left the group keeps its reader blocked, but not the caller."""
+        deadline = time.monotonic() + OUTPUT_GRACE_SECONDS
+        for reader in self.readers:
+            reader.join(max(0, deadline - time.monotonic()))
+        if any(reader.is_alive() for reader in self.readers):
+            kill_process_group(self.process.pid)
+            for reader in self.readers:
+                reader.join(OUTPUT_GRACE_SECONDS)
+
+    def wait(self, timeout):
+        """Wait for the run and return a RunResult.
+
+        On timeout the whole process group is killed and TimeoutExpired is
+        raised, carrying whatever output was captured.
+        """
+        usage = self._wait_for_exit(time.monotonic() + timeout)
+        if usage is None:
+            kill_process_group(self.process.pid)
+            self.process.wait()
+            self._join_readers()
+            raise subprocess.TimeoutExpired(
+                self.command,
+                timeout,
+                output=self.stdout.getvalue(),
+                stderr=self.stderr.getvalue(),
+            )
+
+        self._join_readers()
+        cpu_seconds = peak_rss_bytes = None
+        if usage:
+            cpu_seconds, peak_rss_bytes = usage_from_rusage(usage)
+        return RunResult(
+            self.command,
+            self.process.returncode,
+            self.stdout.getvalue(),
+            self.stderr.getvalue(),
+            cpu_seconds,
+            peak_rss_bytes,
+        )
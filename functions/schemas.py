@@ -0,0 +1,245 @@
+# Function declarations describing the tools to the model.
+#
+# They are kept apart from the tool implementations so that importing a tool
+# does not pull in google.genai; only code that talks to the model needs them.
+from config import MAX_FILE_READ_CHARS, MAX_LIST_ENTRIES, MAX_SEARCH_RESULTS
+from google.genai import types
+
+
+schema_get_files_info = types.FunctionDeclaration(
+    name="get_files_info",
+    description="Lists files in the specified directory along with their sizes, constrained to the working directory. Can list subdirectories recursively, filtered by glob patterns, one page at a time.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "directory": types.Schema(
+                type=types.Type.STRING,
+                description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
+            ),
+            "max_depth": types.Schema(
+                type=types.Type.INTEGER,
+                description="How many directory levels to list. 1 (the default) lists only the directory itself, 0 lists the whole tree.",
+            ),
+            "include": types.Schema(
+                type=types.Type.ARRAY,
+                description='Optional glob patterns, e.g. "*.py"; only matching entries are listed. Patterns match the entry name or its path relative to the listed directory.',
+                items=types.Schema(type=types.Type.STRING),
+            ),
+            "exclude": types.Schema(
+                type=types.Type.ARRAY,
+                description='Optional glob patterns, e.g. "__pycache__"; matching entries are skipped and matching directories are not descended into.',
+                items=types.Schema(type=types.Type.STRING),
+            ),
+            "limit": types.Schema(
+                type=types.Type.INTEGER,
+                description=f"Optional maximum number of entries to return, at most {MAX_LIST_ENTRIES}.",
+            ),
+            "cursor": types.Schema(
+                type=types.Type.INTEGER,
+                description="Continuation cursor from a previous truncated listing.",
+            ),
+        },
+    ),
+)
+
+
+schema_get_file_content = types.FunctionDeclaration(
+    name="get_file_content",
+    description="Reads and returns the contents of a specified file, constrained to the working directory. Large files can be read in slices, either by byte offset and length or by line range.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "file_path": types.Schema(
+                type=types.Type.STRING,
+                description="The path to the file to read, relative to the working directory.",
+            ),
+            "offset": types.Schema(
+                type=types.Type.INTEGER,
+                description="Optional byte offset to start reading from. Defaults to the start of the file.",
+            ),
+            "length": types.Schema(
+                type=types.Type.INTEGER,
+                description=f"Optional maximum number of characters to return, at most {MAX_FILE_READ_CHARS}.",
+            ),
+            "start_line": types.Schema(
+                type=types.Type.INTEGER,
+                description="Optional first line to return, starting at 1. Takes precedence over offset. The lines before it are scanned, so offset is cheaper far into a large file.",
+            ),
+            "end_line": types.Schema(
+                type=types.Type.INTEGER,
+                description="Optional last line to return, inclusive.",
+            ),
+        },
+        required=["file_path"],
+    ),
+)
+
+
+schema_run_python_file = types.FunctionDeclaration(
+    name="run_python_file",
+    description="Executes a Python file with optional command-line arguments, constrained to the working directory.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "file_path": types.Schema(
+                type=types.Type.STRING,
+                description="The path to the Python file to execute, relative to the working directory.",
+            ),
+            "args": types.Schema(
+                type=types.Type.ARRAY,
+                description="Optional command-line arguments to pass to the Python script.",
+                items=types.Schema(type=types.Type.STRING),
+            ),
+        },
+        required=["file_path"],
+    ),
+)
+
+
+schema_write_file = types.FunctionDeclaration(
+    name="write_file",
+    description="Writes content to a specified file, creating it if it doesn't exist, constrained to the working directory.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "file_path": types.Schema(
+                type=types.Type.STRING,
+                description="The path to the file to write, relative to the working directory.",
+            ),
+            "content": types.Schema(
+                type=types.Type.STRING,
+                description="The content to write to the file.",
+            ),
+        },
+        required=["file_path", "content"],
+    ),
+)
+
+
+schema_edit_file = types.FunctionDeclaration(
+    name="edit_file",
+    description="Edits part of an existing file with search/replace blocks or a unified diff, constrained to the working directory. Prefer this over write_file for small changes to large files. The edit is applied all-or-nothing.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "file_path": types.Schema(
+                type=types.Type.STRING,
+                description="The path to the file to edit, relative to the working directory.",
+            ),
+            "edits": types.Schema(
+                type=types.Type.ARRAY,
+                description="Search/replace blocks applied in order. Each search text must occur exactly once in the file.",
+                items=types.Schema(
+                    type=types.Type.OBJECT,
+                    properties={
+                        "search": types.Schema(
+                            type=types.Type.STRING,
+                            description="The exact text to find, including enough context to be unique.",
+                        ),
+                        "replace": types.Schema(
+                            type=types.Type.STRING,
+                            description="The text to replace it with.",
+                        ),
+                    },
+                    required=["search", "replace"],
+                ),
+            ),
+            "patch": types.Schema(
+                type=types.Type.STRING,
+                description="A unified diff for this file, applied after any search/replace blocks.",
+            ),
+        },
+        required=["file_path"],
+    ),
+)
+
+
+schema_search_files = types.FunctionDeclaration(
+    name="search_files",
+    description="Searches the contents of the files in a directory for a regular expression or literal string, constrained to the working directory. Returns matching lines as path:line: text; a match spanning several lines is reported as path:first-last: text of its first line. ^ and $ match at line boundaries.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "pattern": types.Schema(
+                type=types.Type.STRING,
+                description="The regular expression (Python syntax) or literal string to search for.",
+            ),
+            "literal": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Treat the pattern as a literal string instead of a regular expression. Defaults to false.",
+            ),
+            "case_sensitive": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Whether the search is case sensitive. Defaults to true.",
+            ),
+            "directory": types.Schema(
+                type=types.Type.STRING,
+                description="The directory to search in, relative to the working directory. Defaults to the working directory itself.",
+            ),
+            "include": types.Schema(
+                type=types.Type.ARRAY,
+                description='Optional glob patterns, e.g. "*.py"; only matching files are searched.',
+                items=types.Schema(type=types.Type.STRING),
+            ),
+            "max_results": types.Schema(
+                type=types.Type.INTEGER,
+                description=f"Optional maximum number of matching lines to return, at most {MAX_SEARCH_RESULTS}.",
+            ),
+        },
+        required=["pattern"],
+    ),
+)
+
+
+schema_get_code_outline = types.FunctionDeclaration(
+    name="get_code_outline",
+    description="Lists the classes and functions defined in a Python file, or in every Python file under a directory, with their signatures, qualified names and line ranges, constrained to the working directory. Much cheaper than reading whole files.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "path": types.Schema(
+                type=types.Type.STRING,
+                description="The Python file or directory to outline, relative to the working directory. Defaults to the working directory itself.",
+            ),
+        },
+    ),
+)
+
+
+schema_get_symbol_source = types.FunctionDeclaration(
+    name="get_symbol_source",
+    description="Returns the source code of a single class or function in a Python file, constrained to the working directory. Use get_code_outline to find symbol names.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "file_path": types.Schema(
+                type=types.Type.STRING,
+                description="The path to the Python file, relative to the working directory.",
+            ),
+            "symbol": types.Schema(
+                type=types.Type.STRING,
+                description='The qualified name of the symbol, e.g. "Calculator.evaluate".',
+            ),
+        },
+        required=["file_path", "symbol"],
+    ),
+)
+
+
+schema_run_tests = types.FunctionDeclaration(
+    name="run_tests",
+    description="Discovers unittest and pytest tests under a directory of the working directory and runs those affected by files changed since they last passed, following imports. Returns pass/fail counts and one line per failing test.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "path": types.Schema(
+                type=types.Type.STRING,
+                description="Optional test file or directory to run tests from, relative to the working directory. Defaults to the working directory itself.",
+            ),
+            "run_all": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Run every test found, even those unaffected by any change. Defaults to false.",
+            ),
+        },
+    ),
+)
@@ -0,0 +1,132 @@
+import fnmatch
+import os
+import re
+from config import MAX_SEARCH_RESULTS
+from functions.search_index import get_search_index, read_text
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+# Matching lines longer than this are cut short in the results
+MAX_LINE_CHARS = 200
+
+
+def _required_literals(pattern):
+    """Return literal runs every match of the regex must contain."""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return []
+
+    literals = []
+    run = []
+    # Only top-level literals are required; anything else ends the run
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(value))
+            continue
+        if run:
+            literals.append("".join(run))
+        run = []
+    if run:
+        literals.append("".join(run))
+    return literals
+
+
+def search_files(
+    working_directory,
+    pattern,
+    literal=False,
+    case_sensitive=True,
+    directory=".",
+    include=None,
+    max_results=None,
+):
+    try:
+        # Convert working_directory to absolute path and normalize it
+        working_directory = os.path.abspath(working_directory)
+        working_directory = os.path.normpath(working_directory)
+
+        # Create the full path by joining working_directory with the relative directory
+        full_path = os.path.join(working_directory, directory)
+
+        # Normalize the full path to resolve any ".." or "." components
+        full_path = os.path.normpath(full_path)
+
+        # Check if the full path is within the working directory boundaries
+        if not full_path.startswith(working_directory):
+            return f'Error: Cannot search "{directory}" as it is outside the permitted working directory'
+
+        if not os.path.isdir(full_path):
+            return f'Error: "{directory}" is not a directory'
+
+        regex_source = re.escape(pattern) if literal else pattern
+        try:
+            flags = re.MULTILINE if case_sensitive else re.MULTILINE | re.IGNORECASE
+            regex = re.compile(regex_source, flags)
+        except re.error as e:
+            return f'Error: Invalid regular expression "{pattern}": {e}'
+
+        if max_results is None:
+            max_results = MAX_SEARCH_RESULTS
+        max_results = max(1, min(int(max_results), MAX_SEARCH_RESULTS))
+
+        index = get_search_index(working_directory)
+        index.refresh()
+        required = [pattern] if literal else _required_literals(pattern)
+
+        prefix = os.path.relpath(full_path, working_directory)
+        prefix = "" if prefix == "." else prefix + os.sep
+
+        result_lines = []
+        for relative_path in index.candidates(required):
+            if not relative_path.startswith(prefix):
+                continue
+            if include and not any(
+                fnmatch.fnmatch(relative_path, glob)
+                or fnmatch.fnmatch(os.path.basename(relative_path), glob)
+                for glob in include
+            ):
+                continue
+
+            try:
+                text = read_text(os.path.join(working_directory, relative_path))
+            except OSError:
+                continue
+            if text is None:
+                continue
+
+            # Matched against the whole file so a match may span lines;
+            # each line is reported once, for the first match starting on it
+            line_number = 1
+            position = 0
+            reported_line = 0
+            for match in regex.finditer(text):
+                line_number += text.count("\n", position, match.start())
+                position = match.start()
+                if line_number == reported_line:
+                    continue
+                reported_line = line_number
+                if len(result_lines) == max_results:
+                    result_lines.append(
+                        f"[...Search results truncated at {max_results} matches]"
+                    )
+                    return "\n".join(result_lines)
+
+                line_start = text.rfind("\n", 0, match.start()) + 1
+                line_end = text.find("\n", match.start())
+                line = text[line_start : len(text) if line_end == -1 else line_end].rstrip("\r")
+                if len(line) > MAX_LINE_CHARS:
+                    line = line[:MAX_LINE_CHARS] + "..."
+                last_line = line_number + text.count("\n", match.start(), max(match.start(), match.end() - 1))
+                lines = f"{line_number}" if last_line == line_number else f"{line_number}-{last_line}"
+                result_lines.append(f"{relative_path}:{lines}: {line}")
+
+        if not result_lines:
+            return f'No matches found for "{pattern}"'
+        return "\n".join(result_lines)
+
+    except Exception as e:
+        return f"Error: {str(e)}"
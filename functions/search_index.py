@@ -0,0 +1,281 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from config import (
+    CACHE_DIR,
+    SEARCH_INDEX_RESCAN_SECONDS,
+    SEARCH_INDEX_SAVE_SECONDS,
+    SEARCH_MAX_FILE_BYTES,
+)
+
+INDEX_VERSION = 2
+
+
+def trigrams(text):
+    text = text.lower()
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def is_skipped_directory(name):
+    return name == "__pycache__" or name.startswith(".")
+
+
+def read_text(full_path):
+    """Return a file's text, or None for binary files."""
+    with open(full_path, "rb") as file:
+        data = file.read(SEARCH_MAX_FILE_BYTES + 1)
+    if len(data) > SEARCH_MAX_FILE_BYTES or b"\0" in data[:8192]:
+        return None
+    return data.decode("utf-8", errors="replace")
+
+
+class SearchIndex:
+    """Trigram index of the text files under one working directory.
+
+    Kept on disk under CACHE_DIR as JSON and updated incrementally: a rescan
+    stats the indexed files, re-reads only those whose mtime or size changed
+    and lists only directories whose own mtime changed. Files written by the
+    agent are re-read before the next search. Changes are saved at most every
+    SEARCH_INDEX_SAVE_SECONDS and when the process exits.
+    """
+
+    def __init__(self, working_directory):
+        self.working_directory = working_directory
+        digest = hashlib.sha1(working_directory.encode()).hexdigest()[:16]
+        self.store_path = os.path.join(CACHE_DIR, f"search-{digest}.json")
+        self.lock = threading.Lock()
+        # relative path -> (mtime_ns, size, trigrams); trigrams is None for
+        # binary or oversized files
+        self.files = {}
+        # relative directory path -> mtime_ns when it was last listed
+        self.directories = {}
+        self.postings = {}
+        self.dirty = set()
+        self.last_scan = 0.0
+        self.last_save = 0.0
+        self.unsaved = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.store_path, encoding="utf-8") as file:
+                stored = json.load(file)
+            if stored.get("version") != INDEX_VERSION:
+                return
+            directories = {path: int(mtime) for path, mtime in stored["directories"].items()}
+            files = {
+                path: (int(mtime), int(size), None if grams is None else frozenset(grams))
+                for path, (mtime, size, grams) in stored["files"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return
+        self.directories = directories
+        for relative_path, entry in files.items():
+            self._add(relative_path, entry)
+        self.unsaved = False
+
+    def _save(self):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        files = {
+            path: [mtime, size, None if grams is None else sorted(grams)]
+            for path, (mtime, size, grams) in self.files.items()
+        }
+        temp_path = f"{self.store_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"version": INDEX_VERSION, "directories": self.directories, "files": files},
+                file,
+                separators=(",", ":"),
+            )
+        os.replace(temp_path, self.store_path)
+        self.last_save = time.monotonic()
+        self.unsaved = False
+
+    def save(self):
+        """Write the index to CACHE_DIR if it changed since the last save."""
+        with self.lock:
+            if self.unsaved:
+                self._save()
+
+    def _add(self, relative_path, entry):
+        self.files[relative_path] = entry
+        self.unsaved = True
+        for trigram in entry[2] or ():
+            self.postings.setdefault(trigram, set()).add(relative_path)
+
+    def _remove(self, relative_path):
+        entry = self.files.pop(relative_path, None)
+        if entry is None:
+            return
+        self.unsaved = True
+        for trigram in entry[2] or ():
+            paths = self.postings.get(trigram)
+            if paths is not None:
+                paths.discard(relative_path)
+                if not paths:
+                    del self.postings[trigram]
+
+    def _index_file(self, relative_path, stat):
+        full_path = os.path.join(self.working_directory, relative_path)
+        try:
+            text = read_text(full_path)
+        except OSError:
+            self._remove(relative_path)
+            return
+        self._remove(relative_path)
+        self._add(
+            relative_path,
+            (stat.st_mtime_ns, stat.st_size, None if text is None else frozenset(trigrams(text))),
+        )
+
+    def _remove_directory(self, relative_directory):
+        """Forget a directory that is gone and everything indexed under it."""
+        prefix = relative_directory + os.sep
+        for path in [path for path in self.directories if path.startswith(prefix)]:
+            del self.directories[path]
+        self.directories.pop(relative_directory, None)
+        for path in [path for path in self.files if path.startswith(prefix)]:
+            self._remove(path)
+        self.unsaved = True
+
+    def _list_directory(self, relative_directory, mtime_ns):
+        """List one directory, indexing new files and listing new subdirectories."""
+        try:
+            entries = list(os.scandir(os.path.join(self.working_directory, relative_directory)))
+        except OSError:
+            self._remove_directory(relative_directory)
+            return
+        self.directories[relative_directory] = mtime_ns
+        self.unsaved = True
+
+        present = set()
+        for entry in entries:
+            relative_path = os.path.join(relative_directory, entry.name)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if is_skipped_directory(entry.name):
+                        continue
+                    present.add(relative_path)
+                    if relative_path not in self.directories:
+                        self._list_directory(relative_path, entry.stat().st_mtime_ns)
+                elif entry.is_file():
+                    present.add(relative_path)
+                    if relative_path not in self.files:
+                        self._index_file(relative_path, entry.stat())
+            except OSError:
+                continue
+
+        for path in [path for path in self.files if os.path.dirname(path) == relative_directory]:
+            if path not in present:
+                self._remove(path)
+        for path in [path for path in self.directories if path and os.path.dirname(path) == relative_directory]:
+            if path not in present:
+                self._remove_directory(path)
+
+    def _scan(self):
+        # A directory's mtime changes only when entries are added, removed or
+        # renamed in it, so the others need no listing. Sorted, a parent is
+        # listed before its subdirectories.
+        for relative_directory in sorted(set(self.directories) | {""}):
+            if relative_directory and relative_directory not in self.directories:
+                continue  # removed along with its parent
+            full_directory = os.path.join(self.working_directory, relative_directory)
+            try:
+                mtime_ns = os.stat(full_directory).st_mtime_ns
+            except OSError:
+                self._remove_directory(relative_directory)
+                continue
+            if self.directories.get(relative_directory) != mtime_ns:
+                self._list_directory(relative_directory, mtime_ns)
+
+        # A file edited in place only changes its own mtime and size
+        for relative_path, entry in list(self.files.items()):
+            try:
+                stat = os.stat(os.path.join(self.working_directory, relative_path))
+            except OSError:
+                self._remove(relative_path)
+                continue
+            if entry[:2] != (stat.st_mtime_ns, stat.st_size):
+                self._index_file(relative_path, stat)
+
+    def _apply_writes(self):
+        for relative_path in self.dirty:
+            full_path = os.path.join(self.working_directory, relative_path)
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                self._remove(relative_path)
+            else:
+                if os.path.isfile(full_path):
+                    self._index_file(relative_path, stat)
+        self.dirty.clear()
+
+    def refresh(self):
+        with self.lock:
+            self._apply_writes()
+            now = time.monotonic()
+            if now - self.last_scan >= SEARCH_INDEX_RESCAN_SECONDS:
+                self._scan()
+                self.last_scan = time.monotonic()
+            if self.unsaved and now - self.last_save >= SEARCH_INDEX_SAVE_SECONDS:
+                self._save()
+
+    def notify_write(self, full_path):
+        relative_path = os.path.relpath(full_path, self.working_directory)
+        with self.lock:
+            self.dirty.add(relative_path)
+
+    def candidates(self, required_literals):
+        """Return the sorted relative paths that may contain every literal.
+
+        Literals shorter than three characters cannot narrow the search.
+        """
+        with self.lock:
+            candidates = None
+            for literal in required_literals:
+                for trigram in trigrams(literal):
+                    paths = self.postings.get(trigram, set())
+                    candidates = set(paths) if candidates is None else candidates & paths
+                    if not candidates:
+                        return []
+            if candidates is None:
+                candidates = {path for path, entry in self.files.items() if entry[2] is not None}
+            return sorted(candidates)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(working_directory):
+    """Return the shared index for working_directory, loading it on first use."""
+    working_directory = os.path.normpath(os.path.abspath(working_directory))
+    with _indexes_lock:
+        if working_directory not in _indexes:
+            if not _indexes:
+                atexit.register(save_search_indexes)
+            _indexes[working_directory] = SearchIndex(working_directory)
+        return _indexes[working_directory]
+
+
+def notify_write(full_path):
+    """Mark full_path as changed in every loaded index that covers it."""
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        if full_path.startswith(index.working_directory + os.sep):
+            index.notify_write(full_path)
+
+
+def save_search_indexes():
+    """Write every loaded index with unsaved changes to CACHE_DIR."""
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        try:
+            index.save()
+        except OSError:
+            pass
@@ -0,0 +1,269 @@
+import os
+import threading
+from collections import OrderedDict
+from config import TOOL_CACHE_MAX_ENTRIES
+
+
+def _fingerprint(stat):
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def _stat_fingerprint(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return _fingerprint(stat)
+
+
+def file_fingerprint(full_path, working_directory, args):
+    return _stat_fingerprint(full_path)
+
+
+def python_tree_fingerprint(full_path, working_directory, args):
+    # A script can import any module in the working directory, so the whole
+    # tree of .py files (which includes the script itself) is fingerprinted
+    fingerprint = []
+    for root, dirs, files in os.walk(working_directory):
+        dirs[:] = [d for d in dirs if d != "__pycache__" and not d.startswith(".")]
+        for name in files:
+            if name.endswith(".py"):
+                path = os.path.join(root, name)
+                fingerprint.append((path, _stat_fingerprint(path)))
+    return tuple(sorted(fingerprint))
+
+
+def _paths_overlap(a, b):
+    return a == b or a.startswith(b + os.sep) or b.startswith(a + os.sep)
+
+
+def _result_bytes(result):
+    return len(result.encode("utf-8")) if isinstance(result, str) else 0
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+class ToolCache:
+    """LRU cache of tool results, validated against the files they came from.
+
+    An entry is only served while the fingerprint (mtime, size and inode) of
+    its path, or of every path a tracked tool read, is unchanged, and writes drop every entry for an overlapping path.
+    Entries can also be stored ahead of the call that needs them by prefetch;
+    how many of those get used, and the bytes read for ones that don't, is
+    kept in the stats.
+    """
+
+    def __init__(self, max_entries=TOOL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Keys of prefetched entries that no call has used yet
+        self.unused_prefetches = set()
+        self.prefetches = 0
+        self.prefetch_hits = 0
+        self.prefetched_bytes = 0
+        self.prefetch_hit_bytes = 0
+
+    def call(self, function, fingerprint, full_path, working_directory, args, key_args):
+        key = (function.__name__, full_path, _freeze(key_args))
+        current = fingerprint(full_path, working_directory, args)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and current is not None and entry[0] == current:
+                return self._hit(key, entry)
+            self.misses += 1
+
+        result = function(working_directory=working_directory, **args)
+
+        if current is not None:
+            with self.lock:
+                self._store(key, current, result)
+        return result
+
+    def call_tracked(self, function, full_path, working_directory, args, key_args):
+        """Like call, for a function that returns its result together with
+        the (path, os.stat_result) pairs of what it read, or None for a result
+        not to cache. The entry is served while each of those paths still has
+        the same fingerprint, so checking it costs one stat per path read."""
+        key = (function.__name__, full_path, _freeze(key_args))
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and all(
+            _stat_fingerprint(path) == fingerprint for path, fingerprint in entry[0]
+        ):
+            with self.lock:
+                # Unless a write dropped it while it was checked
+                if self.entries.get(key) is entry:
+                    return self._hit(key, entry)
+        with self.lock:
+            self.misses += 1
+
+        result, dependencies = function(working_directory=working_directory, **args)
+
+        if dependencies is not None:
+            fingerprints = tuple((path, _fingerprint(stat)) for path, stat in dependencies)
+            with self.lock:
+                self._store(key, fingerprints, result)
+        return result
+
+    def _hit(self, key, entry):
+        self.entries.move_to_end(key)
+        self.hits += 1
+        if key in self.unused_prefetches:
+            self.unused_prefetches.discard(key)
+            self.prefetch_hits += 1
+            self.prefetch_hit_bytes += _result_bytes(entry[1])
+        return entry[1]
+
+    def prefetch(self, function, fingerprint, full_path, working_directory, args, key_args):
+        """Store the result of a call expected soon, unless it is already
+        cached or is an error. Returns whether anything was stored."""
+        key = (function.__name__, full_path, _freeze(key_args))
+        current = fingerprint(full_path, working_directory, args)
+        if current is None:
+            return False
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == current:
+                return False
+
+        result = function(working_directory=working_directory, **args)
+        if not isinstance(result, str) or result.startswith("Error:"):
+            return False
+
+        with self.lock:
+            # The call itself may have come in while the result was read
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == current:
+                return False
+            self._store(key, current, result)
+            self.unused_prefetches.add(key)
+            self.prefetches += 1
+            self.prefetched_bytes += _result_bytes(result)
+        return True
+
+    def _store(self, key, fingerprint, result):
+        self.entries[key] = (fingerprint, result)
+        self.entries.move_to_end(key)
+        self.unused_prefetches.discard(key)
+        while len(self.entries) > self.max_entries:
+            evicted, _ = self.entries.popitem(last=False)
+            self.unused_prefetches.discard(evicted)
+
+    def invalidate(self, full_path):
+        with self.lock:
+            for key in [key for key in self.entries if _paths_overlap(key[1], full_path)]:
+                del self.entries[key]
+                self.unused_prefetches.discard(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.unused_prefetches.clear()
+            self.prefetches = 0
+            self.prefetch_hits = 0
+            self.prefetched_bytes = 0
+            self.prefetch_hit_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+                "prefetches": self.prefetches,
+                "prefetch_hits": self.prefetch_hits,
+                # Bytes read ahead that no call has used (yet)
+                "prefetch_wasted_bytes": self.prefetched_bytes - self.prefetch_hit_bytes,
+            }
+
+
+tool_cache = ToolCache()
+
+
+def _resolve(working_directory, path):
+    working_directory = os.path.normpath(os.path.abspath(working_directory))
+    full_path = os.path.normpath(os.path.join(working_directory, path))
+    return working_directory, full_path
+
+
+def cached_tool(function, path_arg, fingerprint, default_path="."):
+    """Wrap a read-only tool so its results are served from tool_cache."""
+
+    def wrapper(working_directory, **args):
+        path = args.get(path_arg, default_path) if path_arg else default_path
+        working_directory, full_path = _resolve(working_directory, str(path))
+        # Paths outside the working directory are rejected by the tool itself
+        if not full_path.startswith(working_directory):
+            return function(working_directory=working_directory, **args)
+        # The path is part of the key in normalized form only
+        key_args = {key: value for key, value in args.items() if key != path_arg}
+        return tool_cache.call(
+            function, fingerprint, full_path, working_directory, args, key_args
+        )
+
+    def prefetch(working_directory, **args):
+        # Same key as wrapper, so the call it anticipates is a cache hit
+        path = args.get(path_arg, default_path) if path_arg else default_path
+        working_directory, full_path = _resolve(working_directory, str(path))
+        if not full_path.startswith(working_directory):
+            return False
+        key_args = {key: value for key, value in args.items() if key != path_arg}
+        return tool_cache.prefetch(
+            function, fingerprint, full_path, working_directory, args, key_args
+        )
+
+    wrapper.__name__ = function.__name__
+    wrapper.prefetch = prefetch
+    return wrapper
+
+
+def tracked_tool(function, path_arg, default_path="."):
+    """Wrap a read-only tool returning (result, dependencies), see
+    ToolCache.call_tracked, so its results are served from tool_cache."""
+
+    def wrapper(working_directory, **args):
+        working_directory, full_path = _resolve(working_directory, str(args.get(path_arg, default_path)))
+        if not full_path.startswith(working_directory):
+            return function(working_directory=working_directory, **args)[0]
+        key_args = {key: value for key, value in args.items() if key != path_arg}
+        return tool_cache.call_tracked(function, full_path, working_directory, args, key_args)
+
+    wrapper.__name__ = function.__name__
+    return wrapper
+
+
+# Callables run with the full path of every file written through a tool
+# wrapped by invalidating_tool, e.g. to keep an index up to date
+write_listeners = []
+
+
+def add_write_listener(listener):
+    write_listeners.append(listener)
+
+
+def invalidating_tool(function, path_arg):
+    """Wrap a tool that writes to path_arg so it drops stale cache entries."""
+
+    def wrapper(working_directory, **args):
+        try:
+            return function(working_directory=working_directory, **args)
+        finally:
+            _, full_path = _resolve(working_directory, str(args.get(path_arg, ".")))
+            tool_cache.invalidate(full_path)
+            for listener in write_listeners:
+                listener(full_path)
+
+    wrapper.__name__ = function.__name__
+    return wrapper
@@ -1,5 +1,5 @@
 import os
-from google.genai import types
+from functions.atomic_write import atomic_write
 
 
 def write_file(working_directory, file_path, content):
@@ -23,8 +23,8 @@ def write_file(working_directory, file_path, content):
         if directory and not os.path.exists(directory):
             os.makedirs(directory)
 
-        with open(full_path, "w") as file:
-            file.write(content)
+        # Concurrent readers see either the old or the new file, never a mix
+        atomic_write(full_path, content)
 
         return (
             f'Successfully wrote to "{file_path}" ({len(content)} characters written)'
@@ -34,23 +34,3 @@ def write_file(working_directory, file_path, content):
         return f'Error: Permission denied writing to "{file_path}"'
     except Exception as e:
         return f"Error: {str(e)}"
-
-
-schema_write_file = types.FunctionDeclaration(
-    name="write_file",
-    description="Writes content to a specified file, creating it if it doesn't exist, constrained to the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The path to the file to write, relative to the working directory.",
-            ),
-            "content": types.Schema(
-                type=types.Type.STRING,
-                description="The content to write to the file.",
-            ),
-        },
-        required=["file_path", "content"],
-    ),
-)
@@ -0,0 +1,30 @@
+import gzip
+import json
+import os
+
+
+def append_record(path, record):
+    """Append record to the log at path as one JSON line in its own gzip
+    member, creating the log and its directory if needed.
+
+    A new member keeps the file a valid gzip stream without rewriting what
+    is already there, so a crash can at worst lose the record being written.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with gzip.open(path, "at") as file:
+        file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def read_records(path):
+    """Yield the records of the log at path in the order they were appended.
+
+    Raises FileNotFoundError if there is no log. A crash mid-append leaves a
+    truncated last member; reading stops there, the records before it are
+    still good.
+    """
+    with gzip.open(path, "rt") as file:
+        try:
+            for line in file:
+                yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, ValueError):
+            return
@@ -1,12 +1,34 @@
+import functools
 import os
 import sys
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-from functions.get_files_info import schema_get_files_info, get_files_info
-from functions.get_file_content import schema_get_file_content, get_file_content
-from functions.run_python_file import schema_run_python_file, run_python_file
-from functions.write_file import schema_write_file, write_file
+from functions.get_files_info import get_files_info_tracked
+from functions.get_file_content import get_file_content
+from functions.run_python_file import run_python_file
+from functions.write_file import write_file
+from functions.search_files import search_files
+from functions.search_index import notify_write
+from functions.get_code_outline import get_code_outline
+from functions.get_symbol_source import get_symbol_source
+from functions.edit_file import edit_file
+from functions.impact_index import notify_write as notify_test_index
+from functions.prefetch import format_prefetch_stats, prefetching_listing
+from functions.run_tests import run_tests
+from functions.tool_cache import (
+    add_write_listener,
+    cached_tool,
+    file_fingerprint,
+    invalidating_tool,
+    python_tree_fingerprint,
+    tool_cache,
+    tracked_tool,
+)
+from config import CACHE_RUN_PYTHON_FILE, MAX_ITERATIONS, WORKING_DIRECTORY
+from tracing import span, start_tracing, stop_tracing, traced_tool
+from dispatcher import dispatch_function_calls
+from dispatcher import stats as dispatch_stats
+
+# google.genai takes most of a second to import, so it and everything built
+# on it is only imported once a model call is actually about to happen
 
 system_prompt = """
 You are a helpful AI coding agent.
@@ -17,39 +39,97 @@ When a user asks a question or makes a request, make a function call plan. You c
 - Read file contents
 - Execute Python files with optional arguments
 - Write or overwrite files
+- Edit part of a file with search/replace blocks or a unified diff
+- Search file contents for a regular expression or literal string
+- Outline the classes and functions of Python files and read a single symbol's source
+- Run the unittest/pytest tests affected by the files changed since they last passed
 
 All paths you provide should be relative to the working directory. You do not need to specify the working directory in your function calls as it is automatically injected for security reasons.
 
 When a user asks to "run" a Python file, you should use the run_python_file function to execute it. For example:
 - "run tests.py" -> call run_python_file with file_path="tests.py"
 - "run main.py with arguments 1 2 3" -> call run_python_file with file_path="main.py" and args=["1", "2", "3"]
+
+To check a change you made, prefer run_tests over running test scripts with run_python_file: it only runs the tests the change can affect and reports just the failures.
 """
 
 model_name = "gemini-2.0-flash-001"
 
 
-available_functions = types.Tool(
-    function_declarations=[
-        schema_get_files_info,
-        schema_get_file_content,
-        schema_run_python_file,
-        schema_write_file,
-    ]
-)
+@functools.cache
+def get_generate_config():
+    """Build the GenerateContentConfig with the tool declarations, once."""
+    from google.genai import types
+    from functions import schemas
 
-config = types.GenerateContentConfig(
-    tools=[available_functions], system_instruction=system_prompt
-)
+    available_functions = types.Tool(
+        function_declarations=[
+            schemas.schema_get_files_info,
+            schemas.schema_get_file_content,
+            schemas.schema_run_python_file,
+            schemas.schema_write_file,
+            schemas.schema_edit_file,
+            schemas.schema_search_files,
+            schemas.schema_get_code_outline,
+            schemas.schema_get_symbol_source,
+            schemas.schema_run_tests,
+        ]
+    )
+
+    return types.GenerateContentConfig(
+        tools=[available_functions], system_instruction=system_prompt
+    )
+
+# Dictionary mapping function names to actual functions. Reads are served from
+# the tool cache, writes drop the cache entries they make stale. Listing a
+# directory reads its small files into the cache ahead of the model.
+cached_get_file_content = cached_tool(get_file_content, "file_path", file_fingerprint)
+function_map = {
+    "get_files_info": prefetching_listing(
+        tracked_tool(get_files_info_tracked, "directory"),
+        cached_get_file_content,
+    ),
+    "get_file_content": cached_get_file_content,
+    "run_python_file": (
+        cached_tool(run_python_file, None, python_tree_fingerprint)
+        if CACHE_RUN_PYTHON_FILE
+        else run_python_file
+    ),
+    "write_file": invalidating_tool(write_file, "file_path"),
+    "edit_file": invalidating_tool(edit_file, "file_path"),
+    "search_files": search_files,
+    "get_code_outline": get_code_outline,
+    "get_symbol_source": get_symbol_source,
+    "run_tests": run_tests,
+}
 
-# Dictionary mapping function names to actual functions
+# Every tool call shows up as a span when tracing is on
 function_map = {
-    "get_files_info": get_files_info,
-    "get_file_content": get_file_content,
-    "run_python_file": run_python_file,
-    "write_file": write_file,
+    function_name: traced_tool(function_name, function)
+    for function_name, function in function_map.items()
 }
 
-def call_function(function_call_part, verbose=False):
+# Files written by the agent are re-indexed before the next search, and the
+# tests depending on them are run by the next run_tests call
+add_write_listener(notify_write)
+add_write_listener(notify_test_index)
+
+def function_response(function_name, response):
+    """Wrap a tool's response dict as the Content the model expects back."""
+    from google.genai import types
+
+    return types.Content(
+        role="tool",
+        parts=[
+            types.Part.from_function_response(
+                name=function_name,
+                response=response,
+            )
+        ],
+    )
+
+
+def call_function(function_call_part, verbose=False, working_directory=WORKING_DIRECTORY):
     function_name = function_call_part.name
     
     if verbose:
@@ -59,14 +139,8 @@ def call_function(function_call_part, verbose=False):
     
     # Check if function name is valid
     if function_name not in function_map:
-        return types.Content(
-            role="tool",
-            parts=[
-                types.Part.from_function_response(
-                    name=function_name,
-                    response={"error": f"Unknown function: {function_name}"},
-                )
-            ],
+        return function_response(
+            function_name, {"error": f"Unknown function: {function_name}"}
         )
     
     # Get the function and prepare arguments
@@ -74,101 +148,293 @@ def call_function(function_call_part, verbose=False):
     args = dict(function_call_part.args)
     
     # Add working_directory to the arguments
-    args["working_directory"] = "./calculator"
+    args["working_directory"] = working_directory
     
     # Call the function
     function_result = function(**args)
     
     # Return the result as types.Content
-    return types.Content(
-        role="tool",
-        parts=[
-            types.Part.from_function_response(
-                name=function_name,
-                response={"result": function_result},
-            )
-        ],
-    )
+    return function_response(function_name, {"result": function_result})
+
+
+def _format_seconds(seconds):
+    return "n/a" if seconds is None else f"{seconds:.3f}s"
+
 
+# Options that take a value, which is not a positional argument
+VALUE_OPTIONS = ("--resume", "--fork", "--session", "--trace", "--model-cache")
 
-def main():
-    load_dotenv()
-    api_key = os.environ.get("GEMINI_API_KEY")
 
-    client = genai.Client(api_key=api_key)
+def _positional_args(argv):
+    """Return the arguments after argv[0] that are not options or their values."""
+    positional = []
+    skip_next = False
+    for arg in argv[1:]:
+        if skip_next:
+            skip_next = False
+        elif arg in VALUE_OPTIONS:
+            skip_next = True
+        elif not arg.startswith("--"):
+            positional.append(arg)
+    return positional
 
-    if len(sys.argv) < 2:
+
+def _option(argv, name):
+    """Return the value given as <name> <value> (or <name>=<value>), if any."""
+    for index, arg in enumerate(argv):
+        if arg == name and index + 1 < len(argv):
+            return argv[index + 1]
+        if arg.startswith(name + "="):
+            return arg.split("=", 1)[1]
+    return None
+
+
+def main(argv=None, client=None):
+    """Run one prompt from the command line.
+
+    argv defaults to sys.argv and client to a new rate limited client, see
+    model_client.create_client; the agent
+    daemon passes both to serve requests on its long-lived client.
+    """
+    argv = sys.argv if argv is None else argv
+
+    # The prompt may be left out when resuming or forking a session, or
+    # given after the options as a follow-up turn
+    positional = _positional_args(argv)
+    user_prompt = positional[0] if positional else None
+    resume = _option(argv, "--resume")
+    fork = _option(argv, "--fork")
+    if user_prompt is None and not (resume or fork):
         print("No input provided")
         exit(1)
 
-    user_prompt = sys.argv[1]
-    verbose = "--verbose" in sys.argv
+    from google.genai import types
+    from checkpoint import (
+        SessionLog,
+        SessionNotFound,
+        latest_session,
+        load_session,
+        new_session_name,
+        session_path,
+    )
+    from compaction import compact_messages
+    from model_client import create_client, format_request_stats
+    from response_cache import CachingClient, ResponseCache, format_stats, model_cache_option
+    from streaming import generate_content_streaming
+
+    if client is None:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        api_key = os.environ.get("GEMINI_API_KEY")
+
+        client = create_client(api_key)
+
+    config = get_generate_config()
+
+    verbose = "--verbose" in argv
+    stream = "--stream" in argv
+
+    # --model-cache record|replay|passthrough serves model calls from disk.
+    # The cache wraps the rate limited client, so hits take no quota.
+    model_cache_mode = model_cache_option(argv)
+    if model_cache_mode:
+        client = CachingClient(client, ResponseCache(model_cache_mode))
+
+    # --trace <path> writes a trace of the session: Chrome trace events for a
+    # .json path, JSON lines otherwise
+    trace_path = None
+    if "--trace" in argv[:-1]:
+        trace_path = argv[argv.index("--trace") + 1]
+        tracer = start_tracing()
+
+    # Every iteration is checkpointed to the session's log. --resume
+    # <session> continues a session from its last checkpoint, and --fork
+    # <session>[:<iteration>] starts a new session from the conversation as
+    # it was after any iteration of another; "last" names the latest session.
+    messages = []
+    last_iteration = 0
+    try:
+        if resume:
+            session = latest_session() if resume == "last" else resume
+            if session is None:
+                raise SessionNotFound("No sessions to resume")
+            messages, last_iteration, _ = load_session(session)
+            session_log = SessionLog(session)
+        else:
+            session = _option(argv, "--session") or new_session_name()
+            if os.path.exists(session_path(session)):
+                raise ValueError(f"Session {session} already exists, continue it with --resume {session}")
+            session_log = SessionLog(session)
+            if fork:
+                parent, _, fork_iteration = fork.partition(":")
+                parent = latest_session() if parent == "last" else parent
+                if parent is None:
+                    raise SessionNotFound("No sessions to fork")
+                messages, last_iteration, _ = load_session(
+                    parent, int(fork_iteration) if fork_iteration else None
+                )
+                session_log.start(parent, last_iteration)
+            else:
+                session_log.start()
+    except (SessionNotFound, ValueError) as e:
+        print(f"Error: {e}")
+        return
 
     if verbose:
-        print(f"User prompt: {user_prompt}")
+        print(f"Session: {session}")
+        if user_prompt is not None:
+            print(f"User prompt: {user_prompt}")
 
-    messages = [
-        types.Content(role="user", parts=[types.Part(text=user_prompt)]),
-    ]
+    max_iterations = MAX_ITERATIONS
+    iteration_timings = []
+    prompt_token_counts = []
 
-    max_iterations = 20
-    
-    for iteration in range(max_iterations):
+    def call(function_call_part):
+        return call_function(function_call_part, verbose)
+
+    def count_tokens(contents):
+        return client.models.count_tokens(
+            model=model_name, contents=contents
+        ).total_tokens
+
+    def add_function_responses(iteration, function_calls, function_call_results=None):
+        # Independent calls run concurrently; results come back in call order
+        if function_call_results is None:
+            with span("tools", iteration=iteration, calls=len(function_calls)):
+                function_call_results = dispatch_function_calls(function_calls, call)
+
+        function_responses = []
+        for function_call_result in function_call_results:
+            # Check if the function call result has the expected structure
+            if not hasattr(function_call_result, 'parts') or len(function_call_result.parts) == 0:
+                raise Exception("Function call result does not have expected structure")
+
+            if not hasattr(function_call_result.parts[0], 'function_response'):
+                raise Exception("Function call result does not contain function_response")
+
+            if verbose:
+                print(f"-> {function_call_result.parts[0].function_response.response}")
+
+            function_responses.append(function_call_result)
+
+        # Add all function responses to the conversation
+        messages.extend(function_responses)
+        session_log.tools(iteration, function_responses)
+
+    if messages and messages[-1].role == "model":
+        pending_calls = [part.function_call for part in messages[-1].parts if part.function_call]
+        if pending_calls:
+            # The session stopped after the model asked for tools but before
+            # their results were checkpointed
+            try:
+                add_function_responses(last_iteration, pending_calls)
+            except Exception as e:
+                print(f"Error during generation: {e}")
+                print(f"Resume with: --resume {session}")
+                return
+        elif user_prompt is None:
+            # The session already ended with an answer and there is no new prompt
+            print("".join(part.text or "" for part in messages[-1].parts))
+            return
+
+    if user_prompt is not None:
+        content = types.Content(role="user", parts=[types.Part(text=user_prompt)])
+        messages.append(content)
+        session_log.user(last_iteration + 1, content)
+
+    first_iteration = last_iteration + 1
+    status = "max_iterations"
+    for iteration in range(first_iteration, first_iteration + max_iterations):
         try:
-            response = client.models.generate_content(
-                model=model_name,
-                contents=messages,
-                config=config,
-            )
+            # Old tool outputs are shrunk before the conversation is re-sent
+            with span("compaction", iteration=iteration):
+                contents, _ = compact_messages(messages, count_tokens)
+
+            with span("model", "model", iteration=iteration) as model_span:
+                if stream:
+                    # Tools are dispatched while the response is still streaming
+                    response, function_call_results = generate_content_streaming(
+                        client, model_name, contents, config, call, iteration_timings
+                    )
+                else:
+                    response = client.models.generate_content(
+                        model=model_name,
+                        contents=contents,
+                        config=config,
+                    )
+                    function_call_results = None
+
+                if response.usage_metadata:
+                    model_span["prompt_tokens"] = response.usage_metadata.prompt_token_count
+                    model_span["response_tokens"] = response.usage_metadata.candidates_token_count
+
+            if response.usage_metadata:
+                prompt_token_counts.append(response.usage_metadata.prompt_token_count)
 
-            # Add the response candidates to the conversation
+            # Add the response candidates to the conversation, checkpointing
+            # them before any tool runs
             for candidate in response.candidates:
                 messages.append(candidate.content)
+                session_log.model(iteration, candidate.content)
 
             # Handle function calls first (before checking for text)
             if response.function_calls:
-                function_responses = []
-                
-                for function_call_part in response.function_calls:
-                    function_call_result = call_function(function_call_part, verbose)
-                    
-                    # Check if the function call result has the expected structure
-                    if not hasattr(function_call_result, 'parts') or len(function_call_result.parts) == 0:
-                        raise Exception("Function call result does not have expected structure")
-                    
-                    if not hasattr(function_call_result.parts[0], 'function_response'):
-                        raise Exception("Function call result does not contain function_response")
-                    
-                    if verbose:
-                        print(f"-> {function_call_result.parts[0].function_response.response}")
-                    
-                    function_responses.append(function_call_result)
-                
-                # Add all function responses to the conversation
-                for function_response in function_responses:
-                    messages.append(function_response)
+                add_function_responses(iteration, response.function_calls, function_call_results)
 
             # Check if we have a final text response (no function calls)
             elif response.text:
-                print(response.text)
+                # In streaming mode the text has already been printed
+                if not stream:
+                    print(response.text)
+                status = "done"
                 break
             
             else:
                 # No function calls and no text - something went wrong
                 print("No response text or function calls received")
+                status = "no_response"
                 break
 
         except Exception as e:
             print(f"Error during generation: {e}")
+            status = "error"
             break
 
     else:
         # Loop completed without breaking (max iterations reached)
         print(f"Maximum iterations ({max_iterations}) reached without completion")
 
+    session_log.end(iteration, status)
+    if status in ("max_iterations", "error"):
+        print(f"Resume with: --resume {session}")
+
+    if trace_path:
+        stop_tracing()
+        tracer.export(trace_path)
+
     if verbose:
         print(f"Prompt tokens: {response.usage_metadata.prompt_token_count}")
         print(f"Response tokens: {response.usage_metadata.candidates_token_count}")
+        cache_stats = tool_cache.stats()
+        print(
+            f"Tool cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses"
+        )
+        print(format_prefetch_stats(cache_stats))
+        print(f"Deduplicated tool calls: {dispatch_stats()['deduplicated_calls']}")
+        if model_cache_mode:
+            print(format_stats(client.cache))
+        scheduler = getattr(client, "scheduler", None)
+        if scheduler is not None:
+            print(format_request_stats(scheduler))
+        for index, prompt_token_count in enumerate(prompt_token_counts):
+            print(f"Iteration {first_iteration + index}: prompt tokens={prompt_token_count}")
+        for index, timing in enumerate(iteration_timings):
+            print(
+                f"Iteration {first_iteration + index}: "
+                f"time to first token={_format_seconds(timing['time_to_first_token'])}, "
+                f"time to first tool call={_format_seconds(timing['time_to_first_tool_call'])}"
+            )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,484 @@
+import asyncio
+import bisect
+import contextlib
+import contextvars
+import email.utils
+import itertools
+import random
+import threading
+import time
+import httpx
+from google.genai import types
+from compaction import estimate_tokens
+from config import (
+    MODEL_BASE_URL,
+    MODEL_MAX_RETRIES,
+    MODEL_REQUESTS_PER_MINUTE,
+    MODEL_RETRY_BASE_SECONDS,
+    MODEL_RETRY_MAX_SECONDS,
+    MODEL_TOKENS_PER_MINUTE,
+)
+
+# HTTP statuses worth retrying: timeouts, rate limits and server errors
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# After a 429 the limiter's rates are halved, down to this share of the
+# configured rates, and recover by RATE_RECOVERY_STEP per successful request
+MIN_RATE_SCALE = 0.1
+RATE_RECOVERY_STEP = 0.02
+
+_priority = contextvars.ContextVar("model_request_priority", default=0)
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Queue the model calls made in this block at priority; lower goes first."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Holds up to capacity units, refilled continuously at rate per second.
+
+    Taking more than is left drives the level below zero, so a request that
+    turned out larger than estimated delays the ones after it.
+    """
+
+    def __init__(self, per_minute):
+        self.nominal_rate = per_minute / 60
+        self.rate = self.nominal_rate
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount, now):
+        """Seconds until amount can be taken; a request larger than the
+        bucket only waits for a full one."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+
+class _Waiter:
+    def __init__(self, not_before=0.0, loop=None):
+        # A retry waits in the queue for its backoff, until not_before
+        self.not_before = not_before
+        self.loop = loop
+        self.event = asyncio.Event() if loop else threading.Event()
+
+    def wake(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.event.set)
+        else:
+            self.event.set()
+
+
+def _retry_after(error):
+    """Seconds the API asked us to wait, from a Retry-After header or a
+    google.rpc.RetryInfo detail, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                moment = email.utils.parsedate_to_datetime(value)
+                return max(0.0, moment.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    retry_delay = _find_retry_delay(getattr(error, "details", None))
+    if retry_delay is not None:
+        try:
+            return float(retry_delay.rstrip("s"))
+        except ValueError:
+            pass
+    return None
+
+
+def _find_retry_delay(value):
+    # The RetryInfo detail sits somewhere in the error JSON, e.g.
+    # {"error": {"details": [{"@type": "...RetryInfo", "retryDelay": "37s"}]}}
+    if isinstance(value, dict):
+        if isinstance(value.get("retryDelay"), str):
+            return value["retryDelay"]
+        value = list(value.values())
+    if isinstance(value, list):
+        for item in value:
+            found = _find_retry_delay(item)
+            if found is not None:
+                return found
+    return None
+
+
+class RequestScheduler:
+    """Admits model requests from every session in the process, in priority
+    order, within request and token rate limits, retrying failed calls.
+
+    Requests wait in one queue ordered by (priority, arrival); only the
+    head of the queue may take from the token buckets, so a busy session
+    cannot starve a higher-priority one. A 429 pauses the whole queue for
+    the retry-after the API gave and halves the rates, which then recover
+    as requests succeed. A retry backs off inside the queue, so the backoff
+    is reported as queueing time. The same scheduler serves threads and
+    asyncio tasks.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute=MODEL_REQUESTS_PER_MINUTE,
+        tokens_per_minute=MODEL_TOKENS_PER_MINUTE,
+        max_retries=MODEL_MAX_RETRIES,
+        retry_base_seconds=MODEL_RETRY_BASE_SECONDS,
+        retry_max_seconds=MODEL_RETRY_MAX_SECONDS,
+    ):
+        self.lock = threading.Lock()
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.rate_scale = 1.0
+        self.paused_until = 0.0
+        self.queue = []
+        self.arrivals = itertools.count()
+
+        self.requests = 0
+        self.queued_requests = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.retries = 0
+        self.retries_by_reason = {}
+        self.failures = 0
+
+    def _costs(self, tokens):
+        """The (bucket, amount) pairs a request of tokens tokens takes."""
+        return [
+            (bucket, amount)
+            for bucket, amount in ((self.request_bucket, 1), (self.token_bucket, tokens))
+            if bucket is not None
+        ]
+
+    def _enqueue(self, priority, waiter):
+        entry = (priority, next(self.arrivals), waiter)
+        with self.lock:
+            bisect.insort(self.queue, entry)
+        return entry
+
+    def _head(self, now):
+        """The first entry in the queue that is not backing off, if any."""
+        for entry in self.queue:
+            if entry[2].not_before <= now:
+                return entry
+        return None
+
+    def _wake_head(self):
+        head = self._head(time.monotonic())
+        if head is not None:
+            head[2].wake()
+
+    def _leave(self, entry):
+        with self.lock:
+            if entry in self.queue:
+                self.queue.remove(entry)
+                self._wake_head()
+
+    def _poll(self, entry, tokens):
+        """Admit the entry and return 0, or return how long it should wait;
+        None means until it is woken up as the new head of the queue.
+        Retries that are still backing off don't count as the head."""
+        with self.lock:
+            now = time.monotonic()
+            if entry[2].not_before > now:
+                return entry[2].not_before - now
+            if self._head(now) is not entry:
+                return None
+            delay = self.paused_until - now
+            for bucket, amount in self._costs(tokens):
+                delay = max(delay, bucket.delay(amount, now))
+            if delay > 0:
+                return delay
+            for bucket, amount in self._costs(tokens):
+                bucket.take(amount, now)
+            self.queue.remove(entry)
+            self._wake_head()
+            return 0
+
+    def _admitted(self, queued_seconds):
+        with self.lock:
+            self.requests += 1
+            if queued_seconds > 0.001:
+                self.queued_requests += 1
+            self.queue_seconds += queued_seconds
+            self.max_queue_seconds = max(self.max_queue_seconds, queued_seconds)
+
+    def acquire(self, tokens, backoff=0.0):
+        """Wait in the queue until the request may be sent; a retry first
+        backs off for backoff seconds, counted as queueing time."""
+        started = time.monotonic()
+        waiter = _Waiter(started + backoff)
+        entry = self._enqueue(_priority.get(), waiter)
+        try:
+            while True:
+                delay = self._poll(entry, tokens)
+                if delay == 0:
+                    break
+                waiter.event.wait(delay)
+                waiter.event.clear()
+        except BaseException:
+            self._leave(entry)
+            raise
+        self._admitted(time.monotonic() - started)
+
+    async def acquire_async(self, tokens, backoff=0.0):
+        started = time.monotonic()
+        waiter = _Waiter(started + backoff, asyncio.get_running_loop())
+        entry = self._enqueue(_priority.get(), waiter)
+        try:
+            while True:
+                delay = self._poll(entry, tokens)
+                if delay == 0:
+                    break
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                waiter.event.clear()
+        except BaseException:
+            self._leave(entry)
+            raise
+        self._admitted(time.monotonic() - started)
+
+    def _set_rate_scale(self, scale):
+        self.rate_scale = scale
+        for bucket in (self.request_bucket, self.token_bucket):
+            if bucket is not None:
+                bucket.take(0, time.monotonic())
+                bucket.rate = bucket.nominal_rate * scale
+
+    def settle(self, estimated_tokens, usage_metadata):
+        """Correct a request's token estimate with the usage it reported."""
+        actual = getattr(usage_metadata, "prompt_token_count", None)
+        if actual is None or self.token_bucket is None:
+            return
+        with self.lock:
+            self.token_bucket.take(actual - estimated_tokens, time.monotonic())
+
+    def _succeeded(self):
+        with self.lock:
+            if self.rate_scale < 1.0:
+                self._set_rate_scale(min(1.0, self.rate_scale + RATE_RECOVERY_STEP))
+
+    def retry_delay(self, error, attempt):
+        """Seconds to wait before retrying a failed call, or None to give up."""
+        code = getattr(error, "code", None)
+        if isinstance(code, int):
+            retryable = code in RETRYABLE_STATUSES
+            reason = str(code)
+        else:
+            retryable = isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+            reason = type(error).__name__
+        if not retryable or attempt >= self.max_retries:
+            with self.lock:
+                self.failures += 1
+            return None
+
+        # Full jitter keeps sessions that failed together from retrying together
+        delay = random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2**attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        with self.lock:
+            self.retries += 1
+            self.retries_by_reason[reason] = self.retries_by_reason.get(reason, 0) + 1
+            if code == 429:
+                # Hold everyone back, not just this session
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                self._set_rate_scale(max(MIN_RATE_SCALE, self.rate_scale / 2))
+        return delay
+
+    def call(self, function, tokens=0, queued=True):
+        delay = 0.0
+        for attempt in itertools.count():
+            if queued:
+                self.acquire(tokens, delay)
+            elif delay:
+                time.sleep(delay)
+            try:
+                response = function()
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                continue
+            if queued:
+                self._succeeded()
+                self.settle(tokens, getattr(response, "usage_metadata", None))
+            return response
+
+    async def call_async(self, function, tokens=0, queued=True):
+        delay = 0.0
+        for attempt in itertools.count():
+            if queued:
+                await self.acquire_async(tokens, delay)
+            elif delay:
+                await asyncio.sleep(delay)
+            try:
+                response = await function()
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                continue
+            if queued:
+                self._succeeded()
+                self.settle(tokens, getattr(response, "usage_metadata", None))
+            return response
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "queued_requests": self.queued_requests,
+                "queue_seconds": self.queue_seconds,
+                "max_queue_seconds": self.max_queue_seconds,
+                "retries": self.retries,
+                "retries_by_reason": dict(self.retries_by_reason),
+                "failures": self.failures,
+                "rate_scale": self.rate_scale,
+            }
+
+
+def format_request_stats(scheduler):
+    stats = scheduler.stats()
+    mean = stats["queue_seconds"] / stats["requests"] if stats["requests"] else 0.0
+    line = f"Model requests: {stats['requests']} including {stats['retries']} retries"
+    if stats["retries_by_reason"]:
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in sorted(stats["retries_by_reason"].items()))
+        line += f" ({reasons})"
+    line += (
+        f", {stats['queued_requests']} queued "
+        f"(mean wait {mean:.3f}s, max {stats['max_queue_seconds']:.3f}s)"
+    )
+    if stats["failures"]:
+        line += f", {stats['failures']} failed"
+    return line
+
+
+def _request_tokens(contents):
+    if isinstance(contents, str):
+        return len(contents) // 4
+    if isinstance(contents, types.Content):
+        contents = [contents]
+    return estimate_tokens(contents)
+
+
+class _RateLimitedModels:
+    def __init__(self, models, scheduler):
+        self._models = models
+        self._scheduler = scheduler
+
+    def generate_content(self, *, model, contents, config=None):
+        return self._scheduler.call(
+            lambda: self._models.generate_content(model=model, contents=contents, config=config),
+            _request_tokens(contents),
+        )
+
+    def generate_content_stream(self, *, model, contents, config=None):
+        # Only the request and its first chunk can be retried, once chunks
+        # have been handed out an error ends the stream
+        tokens = _request_tokens(contents)
+
+        def start():
+            stream = iter(self._models.generate_content_stream(model=model, contents=contents, config=config))
+            return stream, next(stream, None)
+
+        stream, chunk = self._scheduler.call(start, tokens)
+        usage_metadata = None
+        while chunk is not None:
+            yield chunk
+            usage_metadata = chunk.usage_metadata or usage_metadata
+            chunk = next(stream, None)
+        self._scheduler.settle(tokens, usage_metadata)
+
+    def count_tokens(self, *, model, contents, config=None):
+        # count_tokens has its own quota, so it is retried but not queued
+        return self._scheduler.call(
+            lambda: self._models.count_tokens(model=model, contents=contents, config=config),
+            queued=False,
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+
+class _AsyncRateLimitedModels(_RateLimitedModels):
+    async def generate_content(self, *, model, contents, config=None):
+        return await self._scheduler.call_async(
+            lambda: self._models.generate_content(model=model, contents=contents, config=config),
+            _request_tokens(contents),
+        )
+
+    async def count_tokens(self, *, model, contents, config=None):
+        return await self._scheduler.call_async(
+            lambda: self._models.count_tokens(model=model, contents=contents, config=config),
+            queued=False,
+        )
+
+
+class _RateLimitedAio:
+    def __init__(self, aio, scheduler):
+        self._aio = aio
+        self.models = _AsyncRateLimitedModels(aio.models, scheduler)
+
+    def __getattr__(self, name):
+        return getattr(self._aio, name)
+
+
+class RateLimitedClient:
+    """Wraps a genai.Client so model calls go through a RequestScheduler."""
+
+    def __init__(self, client, scheduler):
+        self._client = client
+        self.scheduler = scheduler
+        self.models = _RateLimitedModels(client.models, scheduler)
+        self.aio = _RateLimitedAio(client.aio, scheduler)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide request scheduler, creating it on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+
+def create_client(api_key):
+    """Build the genai.Client for the agent, with its model calls scheduled
+    by the process-wide RequestScheduler."""
+    from google import genai
+
+    http_options = types.HttpOptions(base_url=MODEL_BASE_URL) if MODEL_BASE_URL else None
+    client = genai.Client(api_key=api_key, http_options=http_options)
+    return RateLimitedClient(client, get_scheduler())
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import threading
+from google.genai import types
+from config import MODEL_CACHE_PATH
+from gzip_log import append_record, read_records
+
+MODES = ("record", "replay", "passthrough")
+
+
+class ResponseNotRecorded(Exception):
+    pass
+
+
+def _to_json(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    return value
+
+
+def request_key(kind, model, contents, config=None):
+    """Stable hash of a request: the model, the config (which carries the
+    tools and the system prompt) and the full contents."""
+    if isinstance(contents, (str, types.Content)):
+        contents = [contents]
+    request = {
+        "kind": kind,
+        "model": model,
+        "config": _to_json(config),
+        "contents": _to_json(list(contents)),
+    }
+    encoded = json.dumps(request, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Model responses keyed by request_key, kept in a gzip'ed JSON lines file.
+
+    In "record" mode misses go to the API and are appended to the store, in
+    "replay" mode a miss raises ResponseNotRecorded, and "passthrough" never
+    touches the store.
+    """
+
+    def __init__(self, mode, path=MODEL_CACHE_PATH):
+        if mode not in MODES:
+            raise ValueError(f"Unknown model cache mode: {mode}")
+        self.mode = mode
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        if mode != "passthrough":
+            self._load()
+
+    def _load(self):
+        try:
+            for entry in read_records(self.path):
+                self.entries[entry["key"]] = entry["value"]
+        except FileNotFoundError:
+            pass
+
+    def _append(self, key, value):
+        append_record(self.path, {"key": key, "value": value})
+
+    def lookup(self, key):
+        if self.mode == "passthrough":
+            self.misses += 1
+            return None
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        if self.mode == "replay":
+            raise ResponseNotRecorded(f"No recorded response for request {key[:12]}")
+        return None
+
+    def store(self, key, value):
+        if self.mode != "record":
+            return
+        with self.lock:
+            self.entries[key] = value
+            self._append(key, value)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class _CachingModels:
+    def __init__(self, models, cache):
+        self._models = models
+        self._cache = cache
+
+    def generate_content(self, *, model, contents, config=None):
+        key = request_key("generate_content", model, contents, config)
+        cached = self._cache.lookup(key)
+        if cached is not None:
+            return types.GenerateContentResponse.model_validate(cached)
+        response = self._models.generate_content(model=model, contents=contents, config=config)
+        self._cache.store(key, _to_json(response))
+        return response
+
+    def generate_content_stream(self, *, model, contents, config=None):
+        key = request_key("generate_content_stream", model, contents, config)
+        cached = self._cache.lookup(key)
+        if cached is not None:
+            for chunk in cached:
+                yield types.GenerateContentResponse.model_validate(chunk)
+            return
+        chunks = []
+        for chunk in self._models.generate_content_stream(model=model, contents=contents, config=config):
+            chunks.append(_to_json(chunk))
+            yield chunk
+        self._cache.store(key, chunks)
+
+    def count_tokens(self, *, model, contents, config=None):
+        key = request_key("count_tokens", model, contents, config)
+        cached = self._cache.lookup(key)
+        if cached is not None:
+            return types.CountTokensResponse.model_validate(cached)
+        response = self._models.count_tokens(model=model, contents=contents, config=config)
+        self._cache.store(key, _to_json(response))
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+
+class _AsyncCachingModels(_CachingModels):
+    async def generate_content(self, *, model, contents, config=None):
+        key = request_key("generate_content", model, contents, config)
+        cached = self._cache.lookup(key)
+        if cached is not None:
+            return types.GenerateContentResponse.model_validate(cached)
+        response = await self._models.generate_content(model=model, contents=contents, config=config)
+        self._cache.store(key, _to_json(response))
+        return response
+
+    async def count_tokens(self, *, model, contents, config=None):
+        key = request_key("count_tokens", model, contents, config)
+        cached = self._cache.lookup(key)
+        if cached is not None:
+            return types.CountTokensResponse.model_validate(cached)
+        response = await self._models.count_tokens(model=model, contents=contents, config=config)
+        self._cache.store(key, _to_json(response))
+        return response
+
+
+class _CachingAio:
+    def __init__(self, aio, cache):
+        self._aio = aio
+        self.models = _AsyncCachingModels(aio.models, cache)
+
+    def __getattr__(self, name):
+        return getattr(self._aio, name)
+
+
+class CachingClient:
+    """Wraps a genai.Client so model calls go through a ResponseCache."""
+
+    def __init__(self, client, cache):
+        self._client = client
+        self.cache = cache
+        self.models = _CachingModels(client.models, cache)
+        self.aio = _CachingAio(client.aio, cache)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def model_cache_option(argv):
+    """Return the mode given as --model-cache <mode> (or =<mode>), if any."""
+    for index, arg in enumerate(argv):
+        if arg == "--model-cache" and index + 1 < len(argv):
+            return argv[index + 1]
+        if arg.startswith("--model-cache="):
+            return arg.split("=", 1)[1]
+    return None
+
+
+def format_stats(cache):
+    stats = cache.stats()
+    return (
+        f"Model cache ({stats['mode']}): {stats['hits']} hits, "
+        f"{stats['misses']} misses, hit rate {stats['hit_rate']:.0%}"
+    )
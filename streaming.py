@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from google.genai import types
+from config import MAX_TOOL_WORKERS
+from dispatcher import CallScheduler
+
+
+def _append_part(parts, part):
+    # Merge consecutive text chunks so the stored turn looks like a normal response
+    if part.text is not None and parts and parts[-1].text is not None:
+        parts[-1] = types.Part(text=parts[-1].text + part.text)
+    else:
+        parts.append(part)
+
+
+def generate_content_streaming(client, model, contents, config, call, timings):
+    """Stream one model turn, printing text as it arrives.
+
+    Every function call is handed to `call` as soon as its part is complete,
+    while the rest of the turn is still streaming. Returns the assembled
+    response and the function call results in call order. The time to the
+    first text token and to the first function call, in seconds from the
+    request, is appended to `timings`.
+    """
+    started = time.perf_counter()
+    timing = {"time_to_first_token": None, "time_to_first_tool_call": None}
+    timings.append(timing)
+
+    parts = []
+    usage_metadata = None
+
+    with ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS) as executor:
+        scheduler = CallScheduler(executor, call)
+
+        for chunk in client.models.generate_content_stream(
+            model=model,
+            contents=contents,
+            config=config,
+        ):
+            if chunk.usage_metadata:
+                usage_metadata = chunk.usage_metadata
+            if not chunk.candidates or not chunk.candidates[0].content:
+                continue
+
+            for part in chunk.candidates[0].content.parts or []:
+                if part.text:
+                    if timing["time_to_first_token"] is None:
+                        timing["time_to_first_token"] = time.perf_counter() - started
+                    print(part.text, end="", flush=True)
+                elif part.function_call:
+                    if timing["time_to_first_tool_call"] is None:
+                        timing["time_to_first_tool_call"] = (
+                            time.perf_counter() - started
+                        )
+                    scheduler.submit(part.function_call)
+                _append_part(parts, part)
+
+        function_call_results = scheduler.results()
+
+    if timing["time_to_first_token"] is not None:
+        print()
+
+    response = types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(content=types.Content(role="model", parts=parts))
+        ],
+        usage_metadata=usage_metadata,
+    )
+    return response, function_call_results
@@ -10,3 +10,226 @@ print("test 4")
 print(run_python_file("calculator", "../main.py"))
 print("test 5")
 print(run_python_file("calculator", "nonexistent.py"))
+print("test 6")
+from functions.python_worker_pool import WorkerPool
+
+pool = WorkerPool(size=1, max_runs=2)
+print(pool.run("calculator", "tests.py", [], timeout=30))
+print("test 7")
+print(pool.run("calculator", "main.py", ["3 + 5"], timeout=30).stdout)
+pool.close()
+print("test 8")
+from functions.get_file_content import get_file_content
+
+print(get_file_content("calculator", "main.py", start_line=1, end_line=3))
+print("test 9")
+print(get_file_content("calculator", "main.py", offset=0, length=40))
+print("test 10")
+from functions.get_files_info import get_files_info
+
+print(get_files_info("calculator", max_depth=0, include=["*.py"], limit=3))
+print("test 11")
+from functions.search_files import search_files
+
+print(search_files("calculator", r"def _\w+"))
+print("test 12")
+print(search_files("calculator", "LOREM", case_sensitive=False))
+print("test 13")
+from functions.get_code_outline import get_code_outline
+from functions.get_symbol_source import get_symbol_source
+
+print(get_code_outline("calculator", "pkg"))
+print("test 14")
+print(get_symbol_source("calculator", "pkg/calculator.py", "Calculator.evaluate"))
+print("test 15")
+print(get_symbol_source("calculator", "pkg/calculator.py", "missing"))
+print("test 16")
+import tempfile
+from functions.edit_file import edit_file
+from functions.write_file import write_file
+
+with tempfile.TemporaryDirectory() as directory:
+    print(write_file(directory, "edit_me.py", "a = 1\nb = 2\n"))
+    print(edit_file(directory, "edit_me.py", edits=[{"search": "b = 2", "replace": "b = 3"}]))
+    print(edit_file(directory, "edit_me.py", patch="@@ -1,1 +1,1 @@\n-a = 1\n+a = 4\n"))
+    print(get_file_content(directory, "edit_me.py"))
+print("test 17")
+with tempfile.TemporaryDirectory() as directory:
+    write_file(directory, "noisy.py", "for i in range(100000):\n    print(i)\n")
+    write_file(directory, "fails.py", "import sys\nsys.exit(3)\n")
+    print(run_python_file(directory, "noisy.py"))
+    print(run_python_file(directory, "fails.py"))
+print("test 18")
+from functions.run_tests import run_tests
+
+print(run_tests("calculator"))
+print(run_tests("calculator"))
+print("test 19")
+from types import SimpleNamespace
+from dispatcher import dispatch_function_calls
+
+read = SimpleNamespace(name="get_file_content", args={"file_path": "main.py"})
+write = SimpleNamespace(name="write_file", args={"file_path": "main.py", "content": ""})
+ran = []
+print(dispatch_function_calls([read, read, write, read], lambda part: ran.append(part.name) or len(ran)))
+print(ran)
+print("test 20")
+import os
+from functions.prefetch import format_prefetch_stats, get_prefetcher, prefetching_listing
+from functions.get_files_info import get_files_info_tracked
+from functions.tool_cache import cached_tool, file_fingerprint, tool_cache, tracked_tool
+
+with tempfile.TemporaryDirectory() as directory:
+    write_file(directory, "small.txt", "hello\n")
+    write_file(directory, "unread.txt", "bye\n")
+    write_file(directory, "large.txt", "x" * 100000)
+    cached_read = cached_tool(get_file_content, "file_path", file_fingerprint)
+    cached_list = tracked_tool(get_files_info_tracked, "directory")
+    tool_cache.clear()
+    print(prefetching_listing(cached_list, cached_read, enabled=True)(directory))
+    get_prefetcher().join()
+    print(cached_read(directory, file_path="small.txt"))
+    print(format_prefetch_stats(tool_cache.stats()))
+    # A listed file growing in place leaves the directory's mtime alone
+    with open(os.path.join(directory, "small.txt"), "a") as file:
+        file.write("again\n")
+    print(cached_list(directory))
+    print(cached_list(directory, limit=1) == cached_list(directory, limit=1))
+    print(tool_cache.stats()["hits"], tool_cache.stats()["misses"])
+    # Recursive listings see files added below the first level
+    write_file(directory, "pkg/deep/new.txt", "x\n")
+    print(cached_list(directory, max_depth=0, include=["*.txt"]))
+    os.mkdir(os.path.join(directory, "pkg", "deep", "more"))
+    with open(os.path.join(directory, "pkg", "deep", "more", "added.txt"), "w") as file:
+        file.write("added outside the agent\n")
+    print(cached_list(directory, max_depth=0, include=["*.txt"]))
+print("test 21")
+with tempfile.TemporaryDirectory() as directory:
+    write_file(directory, "long_line.txt", "short\n" + "x" * 20000 + "\nend\n")
+    print(get_file_content(directory, "long_line.txt", start_line=2)[-80:])
+    # Skipping a line longer than one scanned block
+    write_file(directory, "longer_line.txt", "x" * 200000 + "\nsecond\nthird\n")
+    print(get_file_content(directory, "longer_line.txt", start_line=2, end_line=2))
+print("test 22")
+import config
+from google.genai import types
+
+
+class _ScriptedModels:
+    """Lists the working directory on the first turn, then answers."""
+
+    def generate_content(self, model, contents, config):
+        if len(contents) == 1:
+            part = types.Part(function_call=types.FunctionCall(name="get_files_info", args={}))
+        else:
+            part = types.Part(text=f"{contents[-1].parts[0].text or 'answered'} after {len(contents)} messages")
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))]
+        )
+
+    def count_tokens(self, model, contents):
+        return types.CountTokensResponse(total_tokens=1)
+
+
+class _ScriptedClient:
+    models = _ScriptedModels()
+
+
+with tempfile.TemporaryDirectory() as directory:
+    config.SESSION_LOG_DIR = directory
+    import main
+
+    main.main(["main.py", "list the files", "--session", "test"], client=_ScriptedClient())
+    main.main(["main.py", "--resume", "test", "follow up"], client=_ScriptedClient())
+    main.main(["main.py", "another prompt", "--session", "test"], client=_ScriptedClient())
+print("test 23")
+from google import genai
+from fake_endpoint import FakeEndpoint
+from model_client import RateLimitedClient, RequestScheduler
+
+endpoint = FakeEndpoint(fault_statuses=(429,), fail_first=2, retry_after=0.05).start()
+try:
+    scheduler = RequestScheduler(retry_base_seconds=0.01)
+    client = RateLimitedClient(
+        genai.Client(api_key="test", http_options=types.HttpOptions(base_url=endpoint.url)),
+        scheduler,
+    )
+    response = client.models.generate_content(model=main.model_name, contents="list the files")
+    print(response.function_calls[0].name)
+    endpoint.fault_statuses, endpoint.fail_first = (503,), 1
+    print(client.models.generate_content(model=main.model_name, contents="again").function_calls[0].name)
+    endpoint.fault_statuses, endpoint.fail_first = (400,), 1
+    try:
+        client.models.generate_content(model=main.model_name, contents="bad request")
+    except genai.errors.ClientError as e:
+        print(f"not retried: {e.code}")
+    stats = scheduler.stats()
+    print(stats["requests"], stats["retries"], stats["retries_by_reason"], stats["failures"])
+    print(stats["queued_requests"] >= 2, stats["queue_seconds"] >= 0.1)
+    print(endpoint.stats())
+finally:
+    endpoint.stop()
+print("test 24")
+with tempfile.TemporaryDirectory() as directory:
+    print(write_file(directory, "multi.py", "def f(\n    x,\n):\n    return x\n"))
+    print(search_files(directory, r"def f\(\s+x"))
+    print(search_files(directory, r"^\s+return"))
+print("test 25")
+from compaction import supersede_stale_reads
+
+
+def _tool_turn(function_name, result, **args):
+    return [
+        types.Content(role="model", parts=[types.Part.from_function_call(name=function_name, args=args)]),
+        types.Content(
+            role="tool",
+            parts=[types.Part.from_function_response(name=function_name, response={"result": result})],
+        ),
+    ]
+
+
+conversation = (
+    _tool_turn("get_file_content", "a = 1", file_path="./a.py")
+    + _tool_turn("get_file_content", "b = 1", file_path="b.py")
+    + _tool_turn("edit_file", 'Successfully edited "a.py"', file_path="a.py")
+    + _tool_turn("write_file", 'Error: Permission denied writing to "b.py"', file_path="b.py")
+)
+for message in supersede_stale_reads(conversation, "/work"):
+    if message.role == "tool":
+        print(message.parts[0].function_response.response["result"])
+print("test 26")
+import io
+from batch import read_prompts
+
+try:
+    list(read_prompts(io.StringIO('"first"\n{"id": "1", "prompt": "second"}\n')))
+except ValueError as e:
+    print(e)
+print("test 27")
+import os
+from batch import prepare_working_directory
+
+with tempfile.TemporaryDirectory() as directory:
+    template = os.path.join(directory, "template")
+    os.makedirs(template)
+    write_file(template, "keep.txt", "template\n")
+    workdir_root = os.path.join(directory, "workdirs")
+    names = set()
+    for record_id in ["..", ".", "", "a/b", "a_b"]:
+        working_directory = prepare_working_directory({"id": record_id}, template, workdir_root)
+        names.add(working_directory)
+        print(repr(record_id), os.path.dirname(working_directory) == workdir_root)
+    print(len(names), os.path.exists(template), sorted(os.listdir(directory)))
+print("test 28")
+from gzip_log import append_record, read_records
+
+with tempfile.TemporaryDirectory() as directory:
+    log_path = os.path.join(directory, "logs", "log.jsonl.gz")
+    append_record(log_path, {"n": 0})
+    append_record(log_path, {"n": 1})
+    good_size = os.path.getsize(log_path)
+    append_record(log_path, {"n": 2})
+    # A crash mid-append leaves the last member cut short
+    with open(log_path, "r+b") as file:
+        file.truncate(good_size + 12)
+    print(list(read_records(log_path)))
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Tracer:
+    """Collects timed spans from any thread and exports them.
+
+    Each span records its wall time, the CPU time of the thread it ran on
+    and free-form attributes such as token counts or bytes read. A span
+    opened on a thread running an asyncio event loop records no CPU time,
+    since that thread's CPU time also counts every other task on the loop.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, category="agent", **attributes):
+        start = time.perf_counter()
+        start_cpu = None if _on_event_loop() else time.thread_time()
+        try:
+            yield attributes
+        finally:
+            end = time.perf_counter()
+            record = {
+                "name": name,
+                "category": category,
+                "start": start - self.origin,
+                "duration": end - start,
+                "cpu_time": None if start_cpu is None else time.thread_time() - start_cpu,
+                "thread": threading.get_ident(),
+                "attributes": attributes,
+            }
+            with self.lock:
+                self.spans.append(record)
+
+    def export_jsonl(self, path):
+        with self.lock:
+            spans = sorted(self.spans, key=lambda record: record["start"])
+        with open(path, "w") as file:
+            for record in spans:
+                file.write(json.dumps(record, default=str) + "\n")
+
+    def export_chrome(self, path):
+        """Write the spans in Chrome trace-event format (chrome://tracing, Perfetto)."""
+        with self.lock:
+            spans = list(self.spans)
+        events = [
+            {
+                "name": record["name"],
+                "cat": record["category"],
+                "ph": "X",
+                "ts": record["start"] * 1e6,
+                "dur": record["duration"] * 1e6,
+                "pid": os.getpid(),
+                "tid": record["thread"],
+                "args": (
+                    dict(record["attributes"])
+                    if record["cpu_time"] is None
+                    else dict(record["attributes"], cpu_time=record["cpu_time"])
+                ),
+            }
+            for record in spans
+        ]
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events}, file, default=str)
+
+    def export(self, path):
+        """Export as Chrome trace events for .json paths, JSON lines otherwise."""
+        if path.endswith(".json"):
+            self.export_chrome(path)
+        else:
+            self.export_jsonl(path)
+
+
+_tracer = None
+
+# How write_file and edit_file report a successful write
+CHARACTERS_WRITTEN = re.compile(r"\b(\d+) characters written\)$")
+
+
+def _on_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def start_tracing():
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop_tracing():
+    """Stop recording spans; the tracer start_tracing returned keeps them."""
+    global _tracer
+    _tracer = None
+
+
+def get_tracer():
+    return _tracer
+
+
+@contextmanager
+def _no_span():
+    yield {}
+
+
+def span(name, category="agent", **attributes):
+    """Time a block as a span of the active tracer; a no-op when tracing is off.
+
+    The context value is the span's attribute dict, so the block can add
+    attributes it only learns while running.
+    """
+    if _tracer is None:
+        return _no_span()
+    return _tracer.span(name, category, **attributes)
+
+
+def traced_tool(function_name, function):
+    """Wrap a tool so each call is recorded as a span with its I/O volume."""
+
+    def wrapper(**args):
+        with span(f"tool:{function_name}", "tool") as attributes:
+            result = function(**args)
+            if _tracer is not None and isinstance(result, str):
+                attributes["result_bytes"] = len(result.encode())
+                written = CHARACTERS_WRITTEN.search(result)
+                if written:
+                    attributes["characters_written"] = int(written.group(1))
+            return result
+
+    wrapper.__name__ = function.__name__
+    return wrapper